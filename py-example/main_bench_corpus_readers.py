@@ -0,0 +1,62 @@
+"""
+Benchmark the corpus readers (XML and JSON) against each other:
+parse time and peak memory, for every book group (or those given by
+--book39 or --section6) in every versification.
+"""
+
+import tracemalloc
+
+from mb_cmn import bib_locales as tbn
+from mb_sefaria import corpus_readers
+from py_misc import my_utils_for_mainish as my_utils_fm
+from py_misc import osis_book_abbrevs
+
+_REPEATS = 3
+_VTRADS = tbn.VT_BHS, tbn.VT_SEF
+
+
+def main():
+    """Benchmark the corpus readers against each other."""
+    bkids = my_utils_fm.get_bk39_tuple_from_argparse()
+    readers = tuple(corpus_readers.CORPUS_READERS.values())
+    heads = [f"{reader.reader_name} {what}" for reader in readers for what in _WHATS]
+    print(f"{'vtrad':<6} {'book group':<48}", *(f"{head:>13}" for head in heads))
+    totals = {head: 0.0 for head in heads}
+    for vtrad in _VTRADS:
+        for bkg in osis_book_abbrevs.bk24_bkgs(bkids):
+            cells = []
+            for reader in readers:
+                path = reader.path(vtrad, bkg["bkg-name"])
+                _output, secs = my_utils_fm.time_best_of(
+                    _REPEATS, _consume, reader, path
+                )
+                cells.append(secs)
+                cells.append(_peak_mb(reader, path))
+            for head, cell in zip(heads, cells):
+                totals[head] = _TOTALLERS[head.split(" ", 1)[1]](totals[head], cell)
+            print(f"{vtrad:<6} {bkg['bkg-name']:<48}", *(f"{c:>13.3f}" for c in cells))
+    print(f"{'total/max':<55}", *(f"{totals[head]:>13.3f}" for head in heads))
+
+
+# For each column, how to combine the rows into a bottom line:
+# secs add up, but peaks don't, so for them we show the max.
+_TOTALLERS = {"secs": lambda x, y: x + y, "peak MB": max}
+_WHATS = tuple(_TOTALLERS)
+
+
+def _peak_mb(reader, path):
+    tracemalloc.start()
+    _consume(reader, path)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def _consume(reader, path):
+    for verse in reader.iter_verses(path):
+        for _etel in verse.iter():
+            pass
+
+
+if __name__ == "__main__":
+    main()
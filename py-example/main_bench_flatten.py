@@ -0,0 +1,76 @@
+"""
+Micro-benchmark my_html.flatten, the flatten that htel_mk (and so every
+element constructor, e.g. span_c) uses, against the recursive flatten that
+we had before.
+
+The shapes are those of the contents that mam4sef_handlers passes to the
+element constructors, plus, to show how the time grows with nesting,
+contents nested to various depths.
+"""
+
+from mb_cmn import hebrew_punctuation as hpu
+from mb_cmn import str_defs as sd
+from mb_cmn.my_utils import sum_of_map
+from py_misc import my_html
+from py_misc import my_utils_for_mainish as my_utils_fm
+
+_REPEATS = 5
+_CALLS = 20000
+
+
+def main():
+    """Micro-benchmark my_html.flatten against the flatten we had before."""
+    word = "בְּרֵאשִׁ֖ית"
+    small = my_html.small((hpu.PASOLEG,))
+    shapes = {
+        # e.g. _samekh2_or_3, _invnun, _legarmeih, _paseq, _implicit_maqaf
+        "one-str tuple": ("{ס}",),
+        "one-str list": [hpu.MAQ],
+        # e.g. _k_velo_q_maq
+        "bare str": hpu.MAQ,
+        # e.g. the ofc1 of _letter_small or _kq_trivial
+        "ofc1": [word, small, sd.THSP, word],
+        # e.g. line_break
+        "none": None,
+    }
+    for depth in 1, 4, 16, 64:
+        shapes[f"nested, depth {depth}"] = _nested(word, small, depth)
+    print(f"{'shape':<20} {'before':>10} {'after':>10} (us per call)")
+    for name, shape in shapes.items():
+        assert my_html.flatten(shape) == _flatten_before(shape), name
+        secs_b = _best(_flatten_before, shape)
+        secs_a = _best(my_html.flatten, shape)
+        print(f"{name:<20} {secs_b * 1e6:>10.2f} {secs_a * 1e6:>10.2f}")
+
+
+def _nested(word, htel, depth):
+    """Return contents like [word, [word, [..., htel]]], depth lists deep."""
+    contents = [word, htel]
+    for _ in range(depth - 1):
+        contents = [word, contents, htel]
+    return contents
+
+
+def _best(fun, shape):
+    """Return the best-of-_REPEATS time per call, in seconds."""
+    _output, secs = my_utils_fm.time_best_of(_REPEATS, _call_many, fun, shape)
+    return secs / _CALLS
+
+
+def _call_many(fun, shape):
+    for _ in range(_CALLS):
+        fun(shape)
+
+
+def _flatten_before(flex_contents):
+    """my_html.flatten as it was, before it was iterative"""
+    if isinstance(flex_contents, str) or my_html.is_htel(flex_contents):
+        return [flex_contents]
+    if isinstance(flex_contents, (tuple, list)):
+        return sum_of_map(_flatten_before, flex_contents)
+    assert flex_contents is None, flex_contents
+    return None
+
+
+if __name__ == "__main__":
+    main()
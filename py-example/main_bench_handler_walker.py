@@ -0,0 +1,49 @@
+"""
+Benchmark the compiled handler walker against the uncompiled one.
+"""
+
+import xml.etree.ElementTree as ET
+
+from mb_cmn import bib_locales as tbn
+from mb_sefaria import handler_walker
+from mb_sefaria import mam4sef_handlers
+from mb_sefaria import corpus_readers
+from py_misc import my_utils_for_mainish as my_utils_fm
+from py_misc import osis_book_abbrevs
+
+_REPEATS = 3
+
+
+def main():
+    """Benchmark the compiled handler walker against the uncompiled one."""
+    handlers = mam4sef_handlers.HANDLERS
+    chandlers = handler_walker.compile_handlers(handlers)
+    totals = {"uncompiled": 0.0, "compiled": 0.0}
+    print(f"{'book group':<48} {'verses':>6} {'uncompiled':>10} {'compiled':>10}")
+    for bkg in osis_book_abbrevs.bk24_bkgs(tbn.ALL_BK39_IDS):
+        path = corpus_readers.XML_READER.path(tbn.VT_SEF, bkg["bkg-name"])
+        verses = tuple(ET.parse(path).getroot().iter("verse"))
+        outs_u, secs_u = my_utils_fm.time_best_of(
+            _REPEATS, _handle_all, handler_walker.handle_uncompiled, handlers, verses
+        )
+        outs_c, secs_c = my_utils_fm.time_best_of(
+            _REPEATS, _handle_all, handler_walker.handle, chandlers, verses
+        )
+        assert outs_u == outs_c, bkg["bkg-name"]
+        totals["uncompiled"] += secs_u
+        totals["compiled"] += secs_c
+        print(f"{bkg['bkg-name']:<48} {len(verses):>6} {secs_u:>10.3f} {secs_c:>10.3f}")
+    ratio = totals["uncompiled"] / totals["compiled"]
+    print(
+        f"{'total':<48} {'':>6}"
+        f" {totals['uncompiled']:>10.3f} {totals['compiled']:>10.3f}"
+        f" ({ratio:.2f}x)"
+    )
+
+
+def _handle_all(handle_fn, handlers, verses):
+    return [handle_fn(handlers, verse) for verse in verses]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark the Sefaria pipeline end to end, timing each of its stages
+separately, for every book group in every versification:
+    parse: parse the XML (ET.parse)
+    render: render the verses with the handlers (mam4sef_or_ajf.render_verse)
+    serialize: serialize the rendered verses (my_html.els_to_str_for_sef)
+    csv: write the CSV files (write_bkg_in_csv_fmt)
+    unicode-names: write the Unicode-names files (write_bkg_in_un_fmt)
+
+Note that the csv stage does its own serialization, so its time includes
+the time of the serialize stage (which measures that serialization alone).
+
+For each stage, we report verses per second and MB per second. For the
+parse, render, and serialize stages, the MB are those of the input XML; for
+the write stages, they are those of the files written.
+
+The results are saved as JSON (by default to
+../MAM-for-Sefaria-bench/bench-pipeline.json), so that runs can be
+compared. Given --baseline, we compare the throughput of this run against
+that of an earlier one.
+
+The outputs are written to ../MAM-for-Sefaria-bench rather than to
+../MAM-for-Sefaria, so as not to disturb the real outputs.
+"""
+
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import main_mam4sef
+from mb_cmn import bib_locales as tbn
+from mb_cmn import file_io
+from mb_cmn import my_utils
+from mb_sefaria import corpus_readers
+from mb_sefaria import mam4sef_or_ajf
+from mb_sefaria import sef_cmn
+from mb_sefaria import write_utils_sef_or_ajf
+from py_misc import my_html
+from py_misc import my_utils_for_mainish as my_utils_fm
+from py_misc import osis_book_abbrevs
+from py_misc import write_utils
+
+MAM_FOR_XXX = "MAM-for-Sefaria-bench"
+
+
+def main():
+    """Benchmark the Sefaria pipeline, stage by stage."""
+    parser = my_utils_fm.mk_arg_parser()
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--results", default=f"../{MAM_FOR_XXX}/bench-pipeline.json")
+    parser.add_argument("--baseline")  # e.g. the --results of an earlier run
+    args = parser.parse_args()
+    bkids = my_utils_fm.get_bk39_tuple_from_args(args)
+    rows = []
+    print(f"{'vtrad':<6} {'book group':<48} {'stage':<14} {'secs':>7} {'verse/s':>9}")
+    for vtrad in tbn.VT_BHS, tbn.VT_SEF:
+        for bkg in osis_book_abbrevs.bk24_bkgs(bkids):
+            for row in _bench_bkg(vtrad, bkg, args.repeats):
+                print(
+                    f"{vtrad:<6} {bkg['bkg-name']:<48} {row['stage']:<14}"
+                    f" {row['secs']:>7.3f} {row['verses-per-sec']:>9.0f}"
+                )
+                rows.append(row)
+    totals = _totals(rows)
+    for total in totals:
+        print(
+            f"{'total':<55} {total['stage']:<14} {total['secs']:>7.3f}"
+            f" {total['verses-per-sec']:>9.0f} ({total['mb-per-sec']:.2f} MB/s)"
+        )
+    results = {"repeats": args.repeats, "rows": rows, "totals": totals}
+    file_io.json_dump_to_file_path(results, args.results)
+    if args.baseline:
+        _compare(args.baseline, totals)
+
+
+def _bench_bkg(vtrad, bkg, repeats):
+    """Return a row of results for each stage, for one book group."""
+    variant = {
+        **main_mam4sef.mk_variant(),
+        "variant-vtrad": vtrad,
+        "variant-mam-for-xxx": MAM_FOR_XXX,
+    }
+    chandlers_from_cant_dab = mam4sef_or_ajf.compile_handlers(variant)
+    cant_dabs = tuple(chandlers_from_cant_dab)
+    xml_path = corpus_readers.XML_READER.path(vtrad, bkg["bkg-name"])
+    stages = {}
+
+    def time_stage(stage, fun, *args):
+        output, stages[stage] = my_utils_fm.time_best_of(repeats, fun, *args)
+        return output
+
+    verses = time_stage("parse", parse, xml_path)
+    bkg_out = time_stage("render", render, variant, chandlers_from_cant_dab, verses)
+    time_stage("serialize", _serialize, bkg_out)
+    csv_paths = time_stage("csv", _write_csv, variant, cant_dabs, bkg_out)
+    un_paths = time_stage("unicode-names", write_un, variant, bkg_out)
+    xml_bytes = os.path.getsize(xml_path)
+    bytes_from_stage = {
+        "parse": xml_bytes,
+        "render": xml_bytes,
+        "serialize": xml_bytes,
+        "csv": sum(map(os.path.getsize, csv_paths)),
+        "unicode-names": sum(map(os.path.getsize, un_paths)),
+    }
+    return [
+        _row(vtrad, bkg["bkg-name"], stage, secs, len(verses), bytes_from_stage[stage])
+        for stage, secs in stages.items()
+    ]
+
+
+def parse(xml_path):
+    """Parse the verses of the XML at xml_path (also used by other benches)."""
+    return tuple(ET.parse(xml_path).getroot().iter("verse"))
+
+
+def render(variant, chandlers_from_cant_dab, verses):
+    """
+    Render verses, returning them as _process_book_group does (also used by
+    other benches).
+    """
+    vtrad = variant["variant-vtrad"]
+    bkg_out = {}
+    for verse in verses:
+        bkid, chnu, vrnu = osis_book_abbrevs.get_bcv_from_osis_id(
+            verse.attrib["osisID"]
+        )
+        bcvt = tbn.mk_bcvtxxx(bkid, chnu, vrnu, vtrad)
+        my_utils.maybe_init_at_key(bkg_out, bkid, {})
+        verse_outs = mam4sef_or_ajf.render_verse(
+            variant, chandlers_from_cant_dab, verse
+        )
+        for cant_dab, verse_out in verse_outs.items():
+            my_utils.append_at_key(bkg_out[bkid], cant_dab, (bcvt, verse_out))
+    return bkg_out
+
+
+def _serialize(bkg_out):
+    for cant_to_verses in bkg_out.values():
+        for verses in cant_to_verses.values():
+            for _bcvt, html_els in verses:
+                my_html.els_to_str_for_sef(html_els)
+
+
+def _write_csv(variant, cant_dabs, bkg_out):
+    paths = []
+    for bkid, cant_to_verses in bkg_out.items():
+        paths.append(write_utils.bkg_path(variant, sef_cmn.SEF_BKNA[bkid]))
+        write_utils_sef_or_ajf.write_bkg_in_csv_fmt(
+            paths[-1], variant, cant_to_verses, cant_dabs
+        )
+    return paths
+
+
+def write_un(variant, bkg_out):
+    """Write the Unicode names files of bkg_out, returning their paths."""
+    paths = []
+    for bkid, cant_to_verses in bkg_out.items():
+        sef_bkna = sef_cmn.SEF_BKNA[bkid]
+        write_utils.write_bkg_in_un_fmt(
+            variant, sef_bkna, cant_to_verses, "rv-cant-combined"
+        )
+        paths.append(write_utils.bkg_path(variant, sef_bkna, fmt_is_unicode_names=True))
+    return paths
+
+
+def _row(vtrad, bkg_name, stage, secs, verse_count, byte_count):
+    return {
+        "vtrad": vtrad,
+        "bkg-name": bkg_name,
+        "stage": stage,
+        "secs": secs,
+        "verses": verse_count,
+        "bytes": byte_count,
+        "verses-per-sec": verse_count / secs,
+        "mb-per-sec": byte_count / 2**20 / secs,
+    }
+
+
+def _totals(rows):
+    """Sum the rows of each stage into a total row for that stage."""
+    sums = {}
+    for row in rows:
+        my_utils.maybe_init_at_key(sums, row["stage"], [0.0, 0, 0])
+        sums[row["stage"]][0] += row["secs"]
+        sums[row["stage"]][1] += row["verses"]
+        sums[row["stage"]][2] += row["bytes"]
+    return [_row("all", "all", stage, *sum3) for stage, sum3 in sums.items()]
+
+
+def _compare(baseline_path, totals):
+    with open(baseline_path, encoding="utf-8") as in_fp:
+        baseline = json.load(in_fp)
+    old_vps = {total["stage"]: total["verses-per-sec"] for total in baseline["totals"]}
+    for total in totals:
+        if total["stage"] in old_vps:
+            ratio = total["verses-per-sec"] / old_vps[total["stage"]]
+            print(f"{total['stage']:<14} {ratio:.2f}x as fast as in {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark shrink.shrink_xml on long sequences of ET.Elements, each followed
+by a run of strings, showing how its time grows with the sequence length.
+
+We compare it, both with and without owned, against the shrink_xml that we
+had before, which deep-copied the preceding element for every string.
+"""
+
+import copy
+import xml.etree.ElementTree as ET
+
+from mb_cmn import shrink
+from py_misc import my_utils_for_mainish as my_utils_fm
+
+_ELEMENT_COUNTS = 1000, 2000, 4000, 8000
+_RUN_LENGTH = 8  # strings after each element
+_SUBTREE_SIZE = 16  # descendants of each element
+_REPEATS = 3
+
+
+def main():
+    """Benchmark shrink.shrink_xml on long sequences."""
+    funs = {
+        "before": _shrink_xml_before,
+        "not owned": shrink.shrink_xml,
+        "owned": lambda parts: shrink.shrink_xml(parts, owned=True),
+    }
+    print(f"{'elements':>8}", *(f"{name:>12}" for name in funs), "(us per element)")
+    for element_count in _ELEMENT_COUNTS:
+        outputs = []
+        cells = []
+        for fun in funs.values():
+            output, secs = _best(fun, element_count)
+            outputs.append(output)
+            cells.append(secs / element_count * 1e6)
+        strs = [list(map(ET.tostring, output)) for output in outputs]
+        assert all(strs_for_fun == strs[0] for strs_for_fun in strs)
+        print(f"{element_count:>8}", *(f"{cell:>12.1f}" for cell in cells))
+
+
+def _best(fun, element_count):
+    """Return the output and the best-of-_REPEATS time, in seconds."""
+
+    def mk_args():
+        return (_mk_parts(element_count),)  # fresh, since owned changes them
+
+    return my_utils_fm.time_best_of(_REPEATS, fun, mk_args=mk_args)
+
+
+def _mk_parts(element_count):
+    parts = []
+    for elnu in range(element_count):
+        etel = ET.Element("w", {"n": str(elnu)})
+        for _ in range(_SUBTREE_SIZE):
+            ET.SubElement(etel, "c", {"text": "x"})
+        parts.append(etel)
+        parts.extend(f" s{strnu}" for strnu in range(_RUN_LENGTH))
+    return parts
+
+
+def _shrink_xml_before(parts):
+    """shrink_xml as it was, before it avoided copies"""
+    acc = []
+    for part in parts:
+        if part == "":
+            continue
+        if acc and isinstance(part, str):
+            if isinstance(acc[-1], ET.Element):
+                acc[-1] = copy.deepcopy(acc[-1])
+                if acc[-1].tail is None:
+                    acc[-1].tail = part
+                else:
+                    acc[-1].tail += part
+                continue
+            acc[-1] += part
+            continue
+        acc.append(part)
+    return type(parts)(acc)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark write_utils.write_bkg_in_un_fmt, i.e. the writing of the
+"Unicode names" files, with uni_heb.join_shunnas as it is (translating
+each string in one pass) and as it was before (looking up the name of each
+character separately).
+
+We render every book group once, then time the writing of its Unicode
+names files with each join_shunnas, checking that both write the same
+thing.
+
+The outputs are written to ../MAM-for-Sefaria-bench rather than to
+../MAM-for-Sefaria, so as not to disturb the real outputs.
+"""
+
+from unittest import mock
+
+import main_bench_pipeline
+import main_mam4sef
+from mb_cmn import bib_locales as tbn
+from mb_cmn import uni_heb as uh
+from mb_sefaria import corpus_readers
+from mb_sefaria import mam4sef_or_ajf
+from py_misc import my_utils_for_mainish as my_utils_fm
+from py_misc import osis_book_abbrevs
+from py_misc import write_utils
+
+_REPEATS = 3
+
+
+def main():
+    """Benchmark write_bkg_in_un_fmt with join_shunnas before and after."""
+    args = my_utils_fm.mk_arg_parser().parse_args()
+    bkids = my_utils_fm.get_bk39_tuple_from_args(args)
+    secs_b = secs_a = 0.0
+    for vtrad in tbn.VT_BHS, tbn.VT_SEF:
+        variant = {
+            **main_mam4sef.mk_variant(),
+            "variant-vtrad": vtrad,
+            "variant-mam-for-xxx": main_bench_pipeline.MAM_FOR_XXX,
+        }
+        chandlers_from_cant_dab = mam4sef_or_ajf.compile_handlers(variant)
+        for bkg in osis_book_abbrevs.bk24_bkgs(bkids):
+            xml_path = corpus_readers.XML_READER.path(vtrad, bkg["bkg-name"])
+            verses = main_bench_pipeline.parse(xml_path)
+            bkg_out = main_bench_pipeline.render(
+                variant, chandlers_from_cant_dab, verses
+            )
+            with mock.patch.object(uh, "join_shunnas", _join_shunnas_before):
+                out_b, bkg_secs_b = _best(variant, bkg_out)
+            out_a, bkg_secs_a = _best(variant, bkg_out)
+            assert out_a == out_b, bkg["bkg-name"]
+            secs_b += bkg_secs_b
+            secs_a += bkg_secs_a
+    print(f"before: {secs_b:.3f} s")
+    print(f"after:  {secs_a:.3f} s ({secs_b / secs_a:.2f}x as fast)")
+
+
+def _best(variant, bkg_out):
+    """
+    Write the Unicode names files of bkg_out, returning their contents and
+    the best-of-_REPEATS time, in seconds.
+    """
+    paths, best = my_utils_fm.time_best_of(
+        _REPEATS, main_bench_pipeline.write_un, variant, bkg_out
+    )
+    contents = []
+    for path in paths:
+        with open(path, encoding="utf-8") as in_fp:
+            contents.append(in_fp.read())
+    return contents, best
+
+
+def _join_shunnas_before(string, sep=","):
+    """uni_heb.join_shunnas as it was, before it used str.translate"""
+    return sep.join(uh.t_shunnas(string))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Compile the XML of MAM-simple into the binary cache read by the xml-cache
+corpus reader. (That reader also compiles the cache as needed, so running
+this is optional; it just moves the cost of compiling up front.)
+"""
+
+from mb_sefaria import corpus_readers
+from py_misc import my_utils_for_mainish as my_utils_fm
+from py_misc import osis_book_abbrevs
+
+
+def main():
+    """Compile the XML of MAM-simple into a binary cache."""
+    bkids = my_utils_fm.get_bk39_tuple_from_argparse()
+    for vtrad in corpus_readers.VTRADS:
+        for bkg in osis_book_abbrevs.bk24_bkgs(bkids):
+            xml_path = corpus_readers.XML_CACHE_READER.path(vtrad, bkg["bkg-name"])
+            my_utils_fm.show_progress_g(__file__, xml_path)
+            corpus_readers.compile_xml_cache(xml_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Build the verse indexes of the XML of MAM-simple, then, as a benchmark,
+look up a single verse both with and without the index.
+
+(VerseIndex also builds indexes as needed, so building them here is
+optional; it just moves the cost of building them up front.)
+"""
+
+import xml.etree.ElementTree as ET
+
+from mb_cmn import bib_locales as tbn
+from mb_sefaria import corpus_readers
+from mb_sefaria import xml_verse_index
+from py_misc import my_utils_for_mainish as my_utils_fm
+from py_misc import osis_book_abbrevs
+
+_REPEATS = 100
+
+
+def main():
+    """Build the verse indexes, then benchmark a single-verse lookup."""
+    parser = my_utils_fm.mk_arg_parser()
+    parser.add_argument("--lookup", default="Ps.119.1")  # an osisID
+    args = parser.parse_args()
+    bkids = my_utils_fm.get_bk39_tuple_from_args(args)
+    for vtrad in corpus_readers.VTRADS:
+        for bkg in osis_book_abbrevs.bk24_bkgs(bkids):
+            xml_path = corpus_readers.XML_READER.path(vtrad, bkg["bkg-name"])
+            my_utils_fm.show_progress_g(__file__, xml_path)
+            xml_verse_index.build_index(xml_path)
+    _bench_lookup(args.lookup)
+
+
+def _bench_lookup(osis_id):
+    xml_path = xml_verse_index.xml_path_of_osis_id(tbn.VT_SEF, osis_id)
+    etel_p, secs_p = my_utils_fm.time_best_of(
+        _REPEATS, _lookup_by_parsing, xml_path, osis_id
+    )
+    with xml_verse_index.VerseIndex(xml_path) as verse_index:
+        etel_i, secs_i = my_utils_fm.time_best_of(
+            _REPEATS, verse_index.element, osis_id
+        )
+    etel_p.tail = None  # The tail is whitespace outside the element's bytes.
+    assert ET.tostring(etel_p) == ET.tostring(etel_i), osis_id
+    print(f"look up {osis_id} by parsing all of {xml_path}: {secs_p * 1e6:.0f} us")
+    print(f"look up {osis_id} with the verse index: {secs_i * 1e6:.0f} us")
+
+
+def _lookup_by_parsing(xml_path, osis_id):
+    root = ET.parse(xml_path).getroot()
+    return next(el for el in root.iter() if el.attrib.get("osisID") == osis_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Lint the outputs of main_mam4sef.py, i.e. its CSV files, doing (in full) the
+checks that the build itself does at --validation strict (see
+my_html.space_problem). This is meant to follow a build done at
+--validation sampled or off, so that skipping the checks in the build costs
+no coverage.
+
+The book groups are linted in parallel (see --jobs).
+
+Exits with status 1 if there are any problems.
+"""
+
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import main_mam4sef
+from mb_sefaria import sef_cmn
+from mb_sefaria import write_utils_sef_or_ajf
+from py_misc import my_html_lint
+from py_misc import my_utils_for_mainish as my_utils_fm
+from py_misc import osis_book_abbrevs
+from py_misc import write_utils
+
+
+def main():
+    """Lint the outputs of main_mam4sef.py."""
+    parser = my_utils_fm.mk_arg_parser()
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    bkids = my_utils_fm.get_bk39_tuple_from_args(args)
+    variant = main_mam4sef.mk_variant()
+    csv_paths = [
+        write_utils.bkg_path(variant, sef_cmn.SEF_BKNA[bkid])
+        for bkg in osis_book_abbrevs.bk24_bkgs(bkids)
+        for bkid in bkg["bkg-bkids"]
+    ]
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        problems = sum(executor.map(_lint_csv_file, csv_paths), [])
+    for csv_path, verse_ref, tag, problem in problems:
+        print(f"{csv_path}: {verse_ref}: {tag}: {problem}")
+    my_utils_fm.show_progress_g(
+        __file__, f"{len(problems)} problem(s) in {len(csv_paths)} file(s)"
+    )
+    if problems:
+        sys.exit(1)
+
+
+def _lint_csv_file(csv_path):
+    """Lint the verse rows of a CSV file, skipping its header rows."""
+    rows = write_utils_sef_or_ajf.read_rows_of_bkg_in_csv_fmt(csv_path)
+    problems = []
+    for verse_ref, cells in rows.items():
+        if not _VERSE_REF.search(verse_ref):
+            continue  # a header row, e.g. Version Notes, not made by htel_mk
+        for cell in cells:
+            for tag, problem in my_html_lint.lint_html_str(cell):
+                problems.append((csv_path, verse_ref, tag, problem))
+    return problems
+
+
+_VERSE_REF = re.compile(r" \d+:\d+$")  # e.g. the " 1:1" of "Genesis 1:1"
+
+
+if __name__ == "__main__":
+    main()
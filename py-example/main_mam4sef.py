@@ -7,11 +7,16 @@ from mb_sefaria import mam4sef_or_ajf
 
 def almost_main():
     """Create the Sefaria MAM from the XML MAM."""
-    variant = {
+    mam4sef_or_ajf.main_helper(mk_variant())
+
+
+def mk_variant():
+    """Make the variant dict for the Sefaria MAM."""
+    return {
         "variant-vtrad": tbn.VT_SEF,
         "variant-handlers": mam4sef_handlers.HANDLERS,
+        "variant-simple-verse-renderer": mam4sef_handlers.render_simple_verse,
     }
-    mam4sef_or_ajf.main_helper(variant)
 
 
 def main():
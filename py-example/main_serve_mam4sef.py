@@ -0,0 +1,32 @@
+"""
+Run a local HTTP server that renders verses of the Sefaria MAM on request.
+See mb_sefaria/verse_server.py for what requests look like.
+"""
+
+import argparse
+
+import main_mam4sef
+from mb_sefaria import verse_server
+from py_misc import my_utils_for_mainish as my_utils_fm
+
+
+def main():
+    """Run a local HTTP server that renders verses of the Sefaria MAM."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--bkg-cache-size", type=int, default=8)
+    parser.add_argument("--verse-cache-size", type=int, default=4096)
+    args = parser.parse_args()
+    server = verse_server.make_server(
+        main_mam4sef.mk_variant(),
+        (args.host, args.port),
+        args.bkg_cache_size,
+        args.verse_cache_size,
+    )
+    my_utils_fm.show_progress_g(__file__, f"serving on {args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ import time
 
 from mb_cmn import provenance
 
-__all__ = ["with_tmp_openw", "json_dump_to_file_path"]
+__all__ = ["with_tmp_openw", "with_tmp_openwb", "json_dump_to_file_path"]
 
 
 def with_tmp_openw(out_path: str, kwargs_dic, write_fun, *write_fun_args):
@@ -19,6 +19,15 @@ def with_tmp_openw(out_path: str, kwargs_dic, write_fun, *write_fun_args):
     return retval
 
 
+def with_tmp_openwb(out_path: str, write_fun, *write_fun_args):
+    """Like with_tmp_openw, but open in binary mode"""
+    tpath = _tmp_path(out_path)
+    with _openwb(tpath) as outfp:
+        retval = write_fun(*write_fun_args, outfp)
+    _replace_file(tpath, out_path)
+    return retval
+
+
 def json_dump_to_file_path(dumpable, out_path: str, generator_file: str = None):
     """Dump JSON to a file path"""
     if generator_file is not None:
@@ -51,10 +60,15 @@ def _sleep(fail_count):
 
 
 def _openw(out_path: str, **kwargs):
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    os.makedirs(os.path.dirname(out_path) or os.curdir, exist_ok=True)
     return open(out_path, "w", encoding="utf-8", **kwargs)
 
 
+def _openwb(out_path: str):
+    os.makedirs(os.path.dirname(out_path) or os.curdir, exist_ok=True)
+    return open(out_path, "wb")
+
+
 def _tmp_path(path: str):
     pathobj = pathlib.Path(path)
     # e.g. from /dfoo/dbar/stem.ext return /dfoo/dbar/stem.tmp.ext
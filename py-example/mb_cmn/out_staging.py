@@ -0,0 +1,141 @@
+"""
+Build-level transactions for output directories.
+
+file_io.with_tmp_openw makes each file atomic on its own, but a build that
+writes many files into an output directory (out_dir) would, while it runs,
+leave that directory with a mix of old and new files. Instead, a build can:
+    * begin: get a staging tree (a sibling of out_dir) that starts out with
+      the current outputs (some hard-linked, the rest copied), and write
+      into it
+    * commit: make the staging tree the current outputs, all at once
+
+A commit moves out_dir aside (to out_dir.old-<stamp>), renames the staging
+tree to out_dir, and then removes the old out_dir. So out_dir stays a plain
+directory, as the repo that holds it (e.g. MAM-for-Sefaria, whose out
+directory is its published content) expects, and readers never find a mix
+of old and new outputs, though between the two renames they may briefly
+find no out_dir at all.
+
+The siblings of out_dir are:
+    * out_dir.staging-<stamp>: the staging tree of a build that is running
+      or that crashed
+    * out_dir.old-<stamp>: an out_dir moved aside by a commit that has not
+      finished (or crashed)
+    * out_dir.gen-<stamp>: a generation directory from when commit, instead,
+      made out_dir a symbolic link to such a directory
+None of them outlives a build that finishes, since clean_stale, which both
+begin and commit call, removes them all, except a generation that out_dir
+(still) links to. (The next commit replaces such a link with a plain
+directory.) But if out_dir is missing, i.e. a commit crashed between its
+two renames, begin first renames the newest old out_dir back, and until
+then clean_stale keeps the old out_dirs and generations. This assumes that
+only one build at a time writes to a given out_dir.
+
+A file that is hard-linked into the staging tree must be written there by
+replacing it (as with_tmp_openw does), never by rewriting it in place,
+which would also change the current outputs. So begin hard-links only the
+files it is told are written that way (linkable), and copies the rest.
+"""
+
+import datetime
+import glob
+import os
+import shutil
+
+__all__ = ["begin", "commit", "clean_stale"]
+
+
+def begin(out_dir, linkable=frozenset()):
+    """
+    Begin a build whose outputs go in out_dir. Return the path of a new
+    staging tree, to which the build should write instead.
+    linkable holds the paths, relative to out_dir, of the files that every
+    writer replaces rather than rewrites (see above), so that they can be
+    hard-linked, rather than copied, into the staging tree.
+    """
+    _restore_old(out_dir)
+    clean_stale(out_dir)
+    staging_dir = f"{out_dir}.staging-{_stamp()}"
+    if os.path.isdir(out_dir):
+
+        def link_or_copy(src, dst):
+            if os.path.relpath(src, out_dir) in linkable:
+                _link_or_copy(src, dst)
+            else:
+                shutil.copy2(src, dst)
+
+        shutil.copytree(out_dir, staging_dir, copy_function=link_or_copy)
+    else:
+        os.makedirs(staging_dir)
+    return staging_dir
+
+
+def commit(out_dir, staging_dir):
+    """
+    Commit a build: make the staging tree staging_dir (from begin) the
+    contents of out_dir, all at once.
+    """
+    if os.path.lexists(out_dir):
+        # If out_dir is a link to a generation, this moves the link aside, and
+        # clean_stale below removes both it and the generation.
+        os.rename(out_dir, f"{out_dir}.old-{_stamp()}")
+    os.rename(staging_dir, out_dir)
+    clean_stale(out_dir)
+
+
+def clean_stale(out_dir):
+    """
+    Remove the siblings of out_dir that are no longer needed: staging trees
+    (e.g. of a build that crashed), old out_dirs moved aside, and
+    generations, except the one (if any) that out_dir links to. If out_dir
+    is missing, old out_dirs and generations are kept, since one of them
+    may hold the last good outputs (see _restore_old).
+    """
+    stale = _siblings(out_dir, "staging")
+    if os.path.lexists(out_dir):
+        current = _current_gen_dir(out_dir)
+        stale.extend(_siblings(out_dir, "old"))
+        stale.extend(
+            gen_dir
+            for gen_dir in _siblings(out_dir, "gen")
+            if os.path.normpath(gen_dir) != current
+        )
+    for stale_dir in stale:
+        if os.path.islink(stale_dir):
+            os.remove(stale_dir)  # e.g. an out_dir link, moved aside by commit
+        else:
+            shutil.rmtree(stale_dir)
+
+
+def _restore_old(out_dir):
+    """
+    If out_dir is missing, e.g. since a commit crashed after moving it
+    aside, rename the newest old out_dir (if any) back to out_dir.
+    """
+    old_dirs = _siblings(out_dir, "old")
+    if old_dirs and not os.path.lexists(out_dir):
+        os.rename(max(old_dirs), out_dir)
+
+
+def _current_gen_dir(out_dir):
+    if not os.path.islink(out_dir):
+        return None
+    gen_dir = os.path.join(os.path.dirname(out_dir), os.readlink(out_dir))
+    return os.path.normpath(gen_dir)
+
+
+def _siblings(out_dir, kind):
+    return glob.glob(f"{glob.escape(out_dir)}.{kind}-*")
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _stamp():
+    # e.g. 20240101T000000000000Z (sortable, and unique enough for a build)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return now.strftime("%Y%m%dT%H%M%S%fZ")
@@ -3,44 +3,131 @@
 import copy
 import xml.etree.ElementTree as ET
 
-__all__ = ["shrink", "shrink_xml"]
+__all__ = ["Builder", "shrink", "shrink_xml"]
+
+
+class Builder:
+    """
+    Accumulate a mix of strings and non-strings, coalescing adjacent strings
+    as shrink does, but lazily: the strings of a run are collected, and
+    joined only once, when the run ends. (shrink, by contrast, used to
+    rebuild the run's string with each string added to it.)
+
+    A builder can be passed along (e.g. to my_html.htel_mk) in place of the
+    list it will build, so that the list is built only once, by whatever
+    finally needs it.
+    """
+
+    __slots__ = ("_parts", "_run")
+
+    def __init__(self):
+        self._parts = []
+        self._run = []  # the strings of the current run, not yet joined
+
+    def append(self, part):
+        """Append part."""
+        if isinstance(part, str):
+            if part:
+                self._run.append(part)
+            return
+        if self._run:
+            self._end_run()
+        self._parts.append(part)
+
+    def extend(self, parts):
+        """Append each of parts."""
+        # This is append, inlined, since it is hot.
+        run = self._run
+        for part in parts:
+            if isinstance(part, str):
+                if part:
+                    run.append(part)
+                continue
+            if run:
+                self._end_run()
+            self._parts.append(part)
+
+    def build(self):
+        """
+        Return a list of the parts appended so far, with adjacent strings
+        coalesced. The builder is left empty.
+        """
+        if self._run:
+            self._end_run()
+        parts = self._parts
+        self._parts = []
+        return parts
+
+    def _end_run(self):
+        run = self._run
+        self._parts.append(run[0] if len(run) == 1 else "".join(run))
+        run.clear()
 
 
 def shrink(parts):
     """
     Coalesce (or "collapse") adjacent strings in an iterable whose parts are
     a mix of strings and non-strings.
+
+    If parts is already shrunk (i.e. has no empty strings and no adjacent
+    strings), it is returned as is, rather than copied.
     """
-    acc = []
-    for part in parts:
-        if part == "":
-            continue
-        if acc and _both_str(acc[-1], part):
-            acc[-1] += part
-            continue
-        acc.append(part)
+    if _is_shrunk(parts):
+        return parts
+    builder = Builder()
+    builder.extend(parts)
     type_of_parts = type(parts)  # presumably list or tuple
-    return type_of_parts(acc)
+    return type_of_parts(builder.build())
 
 
-def shrink_xml(parts):
+def shrink_xml(parts, owned=False):
     """
     Coalesce (or "collapse") adjacent strings in an iterable whose parts are
     a mix of strings and ET.Elements.
+
+    A string that follows an element goes into that element's tail. If
+    owned, i.e. if the caller owns the elements (and so does not mind them
+    being changed), we change their tails in place. Otherwise, we change
+    the tails of copies of them, copying each element only once, when its
+    tail first needs changing.
+
+    As in Builder, the strings of a run are joined only once, when the run
+    ends. So the time this takes grows linearly with the number of parts
+    (plus, if not owned, the size of the elements that get copied).
     """
     acc = []
+    run = []  # the strings of the current run, not yet joined
     for part in parts:
         if part == "":
             continue
-        if acc and isinstance(part, str):
-            _append_to_last(acc, part)
+        if isinstance(part, str):
+            run.append(part)
             continue
-        assert isinstance(part, (ET.Element, str))
+        assert isinstance(part, ET.Element)
+        _end_xml_run(acc, run, owned)
         acc.append(part)
+    _end_xml_run(acc, run, owned)
     type_of_parts = type(parts)  # presumably list or tuple
     return type_of_parts(acc)
 
 
+def _end_xml_run(acc, run, owned):
+    if not run:
+        return
+    string = run[0] if len(run) == 1 else "".join(run)
+    run.clear()
+    if not acc:
+        acc.append(string)
+        return
+    assert isinstance(acc[-1], ET.Element)
+    if not owned:
+        acc[-1] = copy.deepcopy(acc[-1])
+    if acc[-1].tail is None:
+        acc[-1].tail = string
+    else:
+        acc[-1].tail += string
+
+
 def shrextend(accum, objs):
     """Extend accum with objs."""
     for obj in objs:
@@ -55,17 +142,15 @@ def shrappend(accum, obj):
         accum.append(obj)
 
 
-def _both_str(obj1, obj2):
-    return isinstance(obj1, str) and isinstance(obj2, str)
+def _is_shrunk(parts):
+    prev_is_str = False
+    for part in parts:
+        is_str = isinstance(part, str)
+        if is_str and (prev_is_str or not part):
+            return False
+        prev_is_str = is_str
+    return True
 
 
-def _append_to_last(acc, part):
-    if isinstance(acc[-1], ET.Element):
-        acc[-1] = copy.deepcopy(acc[-1])
-        if acc[-1].tail is None:
-            acc[-1].tail = part
-        else:
-            acc[-1].tail += part
-        return
-    assert isinstance(acc[-1], str)
-    acc[-1] += part
+def _both_str(obj1, obj2):
+    return isinstance(obj1, str) and isinstance(obj2, str)
@@ -55,8 +55,14 @@ def join_shunnas(string, sep=","):
     """
     Join the short unicode names of the chars of a string.
     Join with the given separator, or comma by default.
+    The whole string is converted in one pass, by str.translate, using a
+    table that maps each code point to its short name followed by sep.
     """
-    return sep.join(t_shunnas(string))
+    table = _SHUNNA_TABLES.get(sep)
+    if table is None:
+        table = _SHUNNA_TABLES[sep] = _ShunnaTable(sep)
+    joined = string.translate(table)
+    return joined[: len(joined) - len(sep)]  # remove the last sep
 
 
 def t_shunnas(string: str):
@@ -65,6 +71,28 @@ def t_shunnas(string: str):
     return tuple(map(shunna, string))
 
 
+class _ShunnaTable(dict):
+    """
+    A translation table (for str.translate) that maps a code point to its
+    short name (see shunna) followed by a separator. The table starts with
+    the code points of the Hebrew block and those with names in
+    _HE_TO_NONHE_DIC; any others are added the first time they are seen.
+    """
+
+    def __init__(self, sep):
+        super().__init__()
+        self.sep = sep
+        for ordinal in range(0x0590, 0x0600):  # the Hebrew block
+            if unicodedata.name(chr(ordinal), None) is not None:
+                self.__missing__(ordinal)
+        for char in _HE_TO_NONHE_DIC:
+            self.__missing__(ord(char))
+
+    def __missing__(self, ordinal):
+        value = self[ordinal] = shunna(chr(ordinal)) + self.sep
+        return value
+
+
 def _mk_he_to_nonhe_dic():
     nonhe_set = set()
     for _he, nonhe in _HE_AND_NONHE_PAIRS:
@@ -188,6 +216,7 @@ _HE_AND_NONHE_PAIRS = (
 )
 _HE_TO_NONHE_DIC = _mk_he_to_nonhe_dic()
 _HE_TO_NONHE_ACC_DIC = dict(_HE_AND_NONHE_ACC_PAIRS)
+_SHUNNA_TABLES = {}  # maps a separator to its _ShunnaTable
 
 #######################################
 # Note on θ (theta)
@@ -0,0 +1,85 @@
+"""
+Exports:
+    clock
+    since
+    add_time
+    stage_event
+    append_events
+
+A build event is a dict, written as one line of JSON, that describes one
+stage (e.g. parse) of the build of one book group: its wall time, its CPU
+time, how many verses it handled, and how many bytes it wrote. Dashboards
+can read these to track throughput over time.
+
+The stages are:
+    parse: reading the verses from the input (e.g. XML)
+    render: rendering the verses of one cantillation layer (cant_dab)
+    csv: writing the CSV files
+    unicode-names: writing the Unicode-names files
+
+A stage's times are accumulated in a "stage times" dict, which maps a stage
+key, i.e. a (stage, cant_dab) pair, to a dict with "wall-secs", "cpu-secs",
+and "verses". The cant_dab is None except for the render stage.
+
+CPU time is that of the process doing the stage, so it stays meaningful
+when book groups are built in a process pool.
+"""
+
+import json
+import os
+import time
+
+
+def clock():
+    """Return the current (wall, CPU) times, e.g. for since."""
+    return time.perf_counter(), time.process_time()
+
+
+def since(start):
+    """Return the (wall, CPU) times elapsed since start (from clock)."""
+    wall, cpu = clock()
+    return wall - start[0], cpu - start[1]
+
+
+def add_time(stage_times, stage_key, elapsed, verse_count=1, share=1.0):
+    """
+    Add a share of elapsed (from since) and verse_count to the times of
+    stage_key in stage_times.
+    """
+    times = stage_times.get(stage_key)
+    if times is None:
+        times = stage_times[stage_key] = {
+            "wall-secs": 0.0,
+            "cpu-secs": 0.0,
+            "verses": 0,
+        }
+    times["wall-secs"] += elapsed[0] * share
+    times["cpu-secs"] += elapsed[1] * share
+    times["verses"] += verse_count
+
+
+def stage_event(bkg_name, stage_key, times, bytes_written=0):
+    """Return an event for stage stage_key of book group bkg_name."""
+    stage, cant_dab = stage_key
+    return {
+        "event": "stage-done",
+        "bkg-name": bkg_name,
+        "stage": stage,
+        "cant-dab": cant_dab,
+        **times,
+        "bytes-written": bytes_written,
+    }
+
+
+def append_events(path, run_info, events):
+    """
+    Append events, as JSON lines, to the file at path. Each event is first
+    updated with run_info (e.g. when the run started), so that the lines of
+    different runs can be told apart.
+    """
+    if dirname := os.path.dirname(path):
+        os.makedirs(dirname, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as out_fp:
+        for event in events:
+            out_fp.write(json.dumps({**run_info, **event}, ensure_ascii=False))
+            out_fp.write("\n")
@@ -0,0 +1,218 @@
+"""
+Exports:
+    manifest_path
+    load
+    save
+    common_fingerprint
+    bkg_fingerprint
+    verse_fingerprints_path
+    load_verse_fingerprints
+    save_verse_fingerprints
+    verse_fingerprint
+
+A build manifest records, for each book group, a fingerprint of everything
+that its outputs depend on:
+    * the input (e.g. XML) of the book group
+    * the variant dict
+    * the source code of the project's modules that the driver imports
+
+If a book group's fingerprint matches the one in the manifest (and its
+outputs exist), there is no need to build it again.
+
+Alongside the manifest, we keep, for each book group, a fingerprint of each
+of its verses, along with the common fingerprint of the book group's
+outputs. If a book group has changed, but only its input XML has changed
+(i.e. the common fingerprint is the same), then only the verses whose
+fingerprints have changed need to be rendered again. (Since a book group's
+outputs may have been made by an earlier build than the manifest's common
+fingerprint, e.g. one that built only some book groups, we check the
+common fingerprint saved with its verse fingerprints.)
+"""
+
+import functools
+import hashlib
+import json
+import os
+import sys
+
+from mb_cmn import file_io
+from mb_cmn import shrink
+from mb_cmn import uni_heb
+from mb_sefaria import handler_walker
+from mb_sefaria import mam4sef_handlers
+from mb_sefaria import write_utils_sef_or_ajf
+from mb_sefaria import sef_header
+from py_misc import my_html
+from py_misc import my_html_get_lines
+from py_misc import my_htel
+from py_misc import write_utils
+
+# The modules whose source code, if changed, could change the outputs.
+# Besides these, common_fingerprint covers every other module of the
+# project that has been imported (see _project_module_paths), e.g. str_defs
+# (via uni_heb) or corpus_readers, and the driver's own source file.
+_RENDERING_MODULES = (
+    handler_walker,
+    mam4sef_handlers,
+    my_html,
+    my_html_get_lines,
+    my_htel,
+    sef_header,
+    shrink,
+    uni_heb,
+    write_utils,
+    write_utils_sef_or_ajf,
+)
+
+
+# The project's directory, i.e. py-example
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def manifest_path(csv_dir):
+    """
+    Return the path of the manifest for outputs whose CSV files go in
+    csv_dir. E.g. ../MAM-for-Sefaria/out/build-manifest-csv.json for
+    ../MAM-for-Sefaria/out/csv.
+    """
+    parent, csv_folder = os.path.split(csv_dir)
+    return os.path.join(parent, f"build-manifest-{csv_folder}.json")
+
+
+def load(path):
+    """
+    Load the manifest at path, returning an empty one if there is none.
+    A manifest has a "common-fingerprint" (see common_fingerprint) and
+    "book-groups", which maps book group names to fingerprints.
+    """
+    if not os.path.exists(path):
+        return {"common-fingerprint": None, "book-groups": {}}
+    return _json_load(path)
+
+
+def save(path, common_fp, bkg_fps):
+    """Save a manifest."""
+    dumpable = {
+        "common-fingerprint": common_fp,
+        "book-groups": dict(sorted(bkg_fps.items())),
+    }
+    file_io.json_dump_to_file_path(dumpable, path)
+
+
+def verse_fingerprints_path(csv_dir, bkg_name):
+    """
+    Return the path of the verse fingerprints of book group bkg_name, for
+    outputs whose CSV files go in csv_dir. E.g.
+    ../MAM-for-Sefaria/out/verse-fingerprints-csv/Ruth.json for
+    ../MAM-for-Sefaria/out/csv.
+    """
+    parent, csv_folder = os.path.split(csv_dir)
+    return os.path.join(parent, f"verse-fingerprints-{csv_folder}", f"{bkg_name}.json")
+
+
+def load_verse_fingerprints(path, common_fp):
+    """
+    Load the verse fingerprints at path, returning an empty dict if there
+    are none, or if they were saved with a common fingerprint other than
+    common_fp, i.e. for outputs made by other code or another variant. The
+    dict maps osisIDs to fingerprints.
+    """
+    if not os.path.exists(path):
+        return {}
+    saved = _json_load(path)
+    if saved.get("common-fingerprint") != common_fp:
+        return {}
+    return saved["verses"]
+
+
+def save_verse_fingerprints(path, common_fp, verse_fps):
+    """Save verse fingerprints, with the common fingerprint of their outputs."""
+    dumpable = {"common-fingerprint": common_fp, "verses": verse_fps}
+    file_io.json_dump_to_file_path(dumpable, path)
+
+
+def verse_fingerprint(verse):
+    """
+    Return a fingerprint of a <verse> element and all its descendants.
+    It covers what the rendering reads, i.e. tags, attributes, and order,
+    but not the whitespace that the XML has between elements.
+    """
+    hasher = hashlib.sha256()
+    for etel in verse.iter():
+        hasher.update(repr((etel.tag, sorted(etel.attrib.items()), len(etel))).encode())
+    return hasher.hexdigest()
+
+
+def common_fingerprint(variant, driver_path):
+    """
+    Return a fingerprint of the things that all book groups depend on,
+    i.e. the variant and the rendering code (including the driver, whose
+    source file is at driver_path).
+    """
+    code_paths = sorted(
+        {
+            *(os.path.abspath(module.__file__) for module in _RENDERING_MODULES),
+            *_project_module_paths(),
+            os.path.abspath(driver_path),
+        }
+    )
+    code_hashes = [_file_sha256(code_path) for code_path in code_paths]
+    # Where the outputs go (e.g. a staging tree) does not change what they are.
+    variant = {k: v for k, v in variant.items() if k != "variant-out-dir"}
+    return _sha256_of_strs(_variant_str(variant), *code_hashes)
+
+
+def bkg_fingerprint(common_fp, input_path):
+    """
+    Return a fingerprint of a book group, given common_fp (from
+    common_fingerprint) and the path of its input (e.g. XML).
+    """
+    return _sha256_of_strs(common_fp, _file_sha256(input_path))
+
+
+def _project_module_paths():
+    """
+    Return the source paths of the imported modules that are part of this
+    project, i.e. that are under _PROJECT_DIR.
+    """
+    paths = []
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.abspath(path).startswith(_PROJECT_DIR + os.sep):
+            paths.append(os.path.abspath(path))
+    return paths
+
+
+def _json_load(path):
+    with open(path, encoding="utf-8") as in_fp:
+        return json.load(in_fp)
+
+
+def _file_sha256(path):
+    with open(path, "rb") as in_fp:
+        return hashlib.sha256(in_fp.read()).hexdigest()
+
+
+def _sha256_of_strs(*strs):
+    return hashlib.sha256("\n".join(strs).encode("utf-8")).hexdigest()
+
+
+def _variant_str(obj):
+    """
+    Return a string that identifies the given variant (or part thereof).
+    Functions (e.g. handlers) are identified by their qualified names,
+    since their code is covered by the module hashes. A partial is
+    identified by its function and arguments, and any other callable that
+    has no qualified name, by its repr.
+    """
+    if isinstance(obj, dict):
+        items = sorted(f"{_variant_str(k)}:{_variant_str(v)}" for k, v in obj.items())
+        return "{" + ",".join(items) + "}"
+    if isinstance(obj, (tuple, list)):
+        return "(" + ",".join(map(_variant_str, obj)) + ")"
+    if isinstance(obj, functools.partial):
+        parts = obj.func, obj.args, obj.keywords
+        return "partial(" + ",".join(map(_variant_str, parts)) + ")"
+    if callable(obj) and hasattr(obj, "__qualname__"):
+        return f"{obj.__module__}.{obj.__qualname__}"
+    return repr(obj)
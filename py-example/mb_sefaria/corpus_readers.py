@@ -0,0 +1,240 @@
+"""
+Exports:
+    CorpusReader
+    PlainElement
+    XML_READER
+    JSON_READER
+    XML_CACHE_READER
+    CORPUS_READERS
+    VTRADS
+    compile_xml_cache
+    cache_path
+
+A corpus reader reads the book groups of MAM-simple in one of its formats
+(XML or JSON) and yields their verses. The verses it yields are either
+ElementTree elements or objects that behave like them (PlainElement), so
+that the handlers, and the driver that calls them, need not know which
+format the verses came from.
+
+The XML cache reader reads the XML through a compact binary cache of it.
+See compile_xml_cache.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import Callable
+
+from mb_cmn import bib_locales as tbn
+from mb_cmn import file_io
+
+
+@dataclass(frozen=True)
+class CorpusReader:
+    """Holds what is needed to read MAM-simple in a given format."""
+
+    reader_name: str  # e.g. "xml-cache"
+    source_format: str  # e.g. "xml"
+    iter_verses: Callable  # iter_verses(path) yields <verse> elements
+
+    def path(self, vtrad, bkg_name):
+        """Return the path of the input for book group bkg_name."""
+        fmt = self.source_format
+        vtrad_xxx = _VTRAD_XXX_DIC[vtrad]
+        return f"../MAM-simple/out/{fmt}-{vtrad_xxx}/{bkg_name}.{fmt}"
+
+
+class PlainElement:
+    """
+    An element presented as if it were an ElementTree element. It has as
+    much of the ElementTree element API as the rendering code uses: tag,
+    attrib, len, iteration over children, find, and iter.
+    """
+
+    __slots__ = ("tag", "attrib", "_children")
+
+    def __init__(self, tag, attrib, children):
+        self.tag = tag
+        self.attrib = attrib
+        self._children = children
+
+    def __iter__(self):
+        return iter(self._children)
+
+    def __len__(self):
+        return len(self._children)
+
+    def find(self, tag):
+        """Return the first child with the given tag, or None."""
+        return next((child for child in self._children if child.tag == tag), None)
+
+    def iter(self):
+        """Yield this element and all its descendants, in document order."""
+        yield self
+        for child in self._children:
+            yield from child.iter()
+
+
+def _iter_xml_verses(path):
+    """
+    Yield the <verse> elements of the XML file at path, one at a time,
+    each one fully parsed (i.e. with all its descendants).
+
+    We use iterparse rather than parse so that we never hold the whole
+    book group in memory: once the caller is done with a verse, we clear
+    it, and once we reach the end of a chapter, we clear the chapter.
+    """
+    for _event, etel in ET.iterparse(path):
+        if etel.tag == "verse":
+            yield etel
+            etel.clear()
+        elif etel.tag == "chapter":
+            etel.clear()
+
+
+def _iter_json_verses(path):
+    """
+    Yield the verses of the JSON file at path, one at a time, each one as
+    a PlainElement. The JSON format gives verses no "type"; they are the
+    objects in the contents of a chapter that have no "type".
+    """
+    with open(path, encoding="utf-8") as in_fp:
+        root = json.load(in_fp)
+    for book39 in _of_type("book39", root["contents"]):
+        for chapter in _of_type("chapter", book39["contents"]):
+            for verse in _of_type(None, chapter["contents"]):
+                yield _element_from_json("verse", verse)
+
+
+def _element_from_json(tag, json_obj):
+    attrib = {
+        key: val for key, val in json_obj.items() if key not in ("type", "contents")
+    }
+    children = [
+        _element_from_json(child["type"], child)
+        for child in json_obj.get("contents", ())
+    ]
+    return PlainElement(tag, attrib, children)
+
+
+def _of_type(the_type, json_objs):
+    # This skips things like the parashah markers between books and chapters.
+    return (json_obj for json_obj in json_objs if json_obj.get("type") == the_type)
+
+
+def compile_xml_cache(xml_path):
+    """
+    Compile the XML file at xml_path into a binary cache of its verses, and
+    return those verses.
+
+    The cache is two marshal records: a small header, which is (version,
+    Python version, XML hash), then the verses, which are a tuple of nodes,
+    where a node is a (tag, attrib, child nodes) tuple. This lets a reader
+    reject a stale cache by loading only its header. Before marshalling, we
+    intern the strings (tags, attribute names, and attribute values), i.e.
+    we make equal strings be the same object, so that marshal stores each
+    of them only once.
+
+    Loading this with marshal is much faster than parsing the XML, since
+    marshal builds the strings, dicts, and tuples directly, in C.
+    """
+    interned = {}
+    verses = tuple(_encode(interned, verse) for verse in _iter_xml_verses(xml_path))
+    header = _cache_header(xml_path)
+    file_io.with_tmp_openwb(cache_path(xml_path, "marshal"), _dump, header, verses)
+    return verses
+
+
+def _iter_xml_cache_verses(xml_path):
+    """
+    Yield the verses of the XML file at xml_path, one at a time, each one as
+    a PlainElement, reading them from the cache rather than from the XML
+    itself. If the cache is missing or stale (e.g. the hash of the XML has
+    changed) or cannot be loaded, we rebuild it first.
+    """
+    verses = _load_fresh_cache(xml_path)
+    if verses is None:
+        verses = compile_xml_cache(xml_path)
+    for verse in verses:
+        yield _decode(verse)
+
+
+def _load_fresh_cache(xml_path):
+    """
+    Return the verses in the cache of the XML file at xml_path, or None if
+    the cache is missing, stale, or cannot be loaded (e.g. it is truncated,
+    or in a format from another version of this code or of Python).
+    """
+    marshal_path = cache_path(xml_path, "marshal")
+    if not os.path.exists(marshal_path):
+        return None
+    try:
+        with open(marshal_path, "rb") as in_fp:
+            if marshal.load(in_fp) != _cache_header(xml_path):
+                return None
+            # marshal.loads of the rest of the file is several times faster
+            # than marshal.load, which reads the file in many small pieces.
+            return marshal.loads(in_fp.read())
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def _cache_header(xml_path):
+    return _CACHE_VERSION, tuple(sys.version_info[:2]), _file_sha256(xml_path)
+
+
+def _dump(header, verses, out_fp):
+    marshal.dump(header, out_fp)
+    marshal.dump(verses, out_fp)
+
+
+def _file_sha256(path):
+    with open(path, "rb") as in_fp:
+        return hashlib.sha256(in_fp.read()).hexdigest()
+
+
+def cache_path(xml_path, ext):
+    """
+    Return the path of a file, derived from the XML file at xml_path, that
+    we keep in the cache directory. E.g. from
+    ../MAM-simple/out/xml-vtrad-sef/Gen.xml and "marshal" return
+    ../MAM-simple/.cache/xml-vtrad-sef/Gen.marshal
+    """
+    xml_dir, xml_file = os.path.split(xml_path)
+    out_dir, xml_folder = os.path.split(xml_dir)
+    stem = os.path.splitext(xml_file)[0]
+    cache_dir = os.path.join(os.path.dirname(out_dir), ".cache", xml_folder)
+    return os.path.join(cache_dir, f"{stem}.{ext}")
+
+
+def _encode(interned, etel):
+    def intern(string):
+        return interned.setdefault(string, string)
+
+    attrib = {intern(name): intern(value) for name, value in etel.attrib.items()}
+    children = tuple(_encode(interned, child) for child in etel)
+    return intern(etel.tag), attrib, children
+
+
+def _decode(node):
+    tag, attrib, children = node
+    return PlainElement(tag, attrib, [_decode(child) for child in children])
+
+
+_CACHE_VERSION = 3  # Increment this when the cache format changes.
+_VTRAD_XXX_DIC = {
+    tbn.VT_BHS: "vtrad-bhs",
+    tbn.VT_SEF: "vtrad-sef",
+    tbn.VT_MAM: "vtrad-mam",
+}
+VTRADS = tuple(_VTRAD_XXX_DIC)  # the vtrads that MAM-simple has inputs in
+XML_READER = CorpusReader("xml", "xml", _iter_xml_verses)
+JSON_READER = CorpusReader("json", "json", _iter_json_verses)
+XML_CACHE_READER = CorpusReader("xml-cache", "xml", _iter_xml_cache_verses)
+CORPUS_READERS = {
+    reader.reader_name: reader for reader in (XML_READER, JSON_READER, XML_CACHE_READER)
+}
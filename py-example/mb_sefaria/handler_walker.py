@@ -0,0 +1,309 @@
+"""
+Exports:
+    needs
+    compile_handlers
+    handle
+    handle_layers
+    handle_uncompiled
+    take_timings
+
+A handlers table (e.g. mam4sef_handlers.HANDLERS) maps a (tag, class) key to
+a handler function taking (etel, ofc1, ofc2), where:
+    etel: ElementTree element
+    ofc1: output for all children, summed together
+    ofc2: output for all children, per child
+
+A handler declares which of ofc1 and ofc2 it needs with the needs
+decorator, so that the walker can skip the work of building whichever of
+them is not needed. (A handler that declares nothing, e.g. a partial, is
+given both.) If a handler needs neither, the walker does not render the
+element's children, though it still checks that each of them (and their
+descendants) has a handler, just as rendering them would.
+
+compile_handlers can also compile a table whose handlers are timed. Timing
+is done by the walk functions of such a table (and, in layered rendering,
+by handle_layers, if the first of its tables is timed), so a table compiled
+without timing pays nothing for it.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from mb_cmn import shrink
+
+
+@dataclass(frozen=True)
+class CompiledHandler:
+    """Holds a handler and which of its child-output arguments it needs."""
+
+    handler: Callable
+    wants_ofc1: bool
+    wants_ofc2: bool
+    walk: Callable = field(compare=False)  # walk(self, chandlers, etel)
+    key: tuple = None  # (tag, class), for timing
+    untimed_walk: Callable = field(default=None, compare=False)
+
+    def wants_children(self):
+        """Return whether this handler needs its element's children rendered."""
+        return self.wants_ofc1 or self.wants_ofc2
+
+
+def needs(*child_outputs):
+    """
+    Return a decorator that declares which child outputs ("ofc1" and/or
+    "ofc2") a handler needs, e.g. @needs("ofc1"), or @needs() for neither.
+    """
+    needed = frozenset(child_outputs)
+    assert needed <= _CHILD_OUTPUTS, child_outputs
+
+    def decorate(handler):
+        handler.walker_needs = needed
+        return handler
+
+    return decorate
+
+
+def compile_handlers(handlers, timed=False):
+    """
+    Compile a handlers table into a table of CompiledHandler.
+    If timed, the handlers are timed; see take_timings.
+    """
+    chandlers = {key: _compile_handler(handler) for key, handler in handlers.items()}
+    if timed:
+        return {
+            key: CompiledHandler(
+                chandler.handler,
+                chandler.wants_ofc1,
+                chandler.wants_ofc2,
+                _walk_timed,
+                key,
+                chandler.walk,
+            )
+            for key, chandler in chandlers.items()
+        }
+    return chandlers
+
+
+def take_timings():
+    """
+    Return the timings of the timed handlers that have run (in this process)
+    since the last call to take_timings, and start afresh. The timings are a
+    dict that maps each (tag, class) key to a dict with:
+        "calls": the number of calls to the handler
+        "cum-secs": the time spent in the handler, including its children
+        "self-secs": the time spent in the handler, excluding its children
+        "outputs": the total length of the handler's outputs (i.e. the
+            number of strings and HTML elements in them)
+    """
+    timings = dict(_TIMINGS)
+    _TIMINGS.clear()
+    return timings
+
+
+def handle(chandlers, etel):
+    """
+    Render etel using chandlers, a table made by compile_handlers.
+    """
+    chandler = chandlers[etel.tag, etel.attrib.get("class")]
+    return chandler.walk(chandler, chandlers, etel)
+
+
+def handle_layers(chandlers_seq, etel):
+    """
+    Like handle, but for a sequence of compiled handler tables (e.g. one
+    per cantillation layer) at once. Return a tuple of outputs, one per
+    table.
+
+    A subtree is rendered only once, and its output shared by all tables,
+    if neither it nor any of its descendants has a (tag, class) whose
+    handler varies across the tables. In practice, this means that only
+    the subtrees under <cant-all-three> are rendered separately for each
+    layer.
+    """
+    key = etel.tag, etel.attrib.get("class")
+    chandlers_for_key = [chandlers[key] for chandlers in chandlers_seq]
+    if chandlers_for_key[0].untimed_walk is not None:
+        # An element counts as one call, whether its output is shared by all
+        # tables or made separately for each.
+        return _timed(
+            key, _layers_len, _handle_layers, chandlers_seq, etel, chandlers_for_key
+        )
+    return _handle_layers(chandlers_seq, etel, chandlers_for_key)
+
+
+def handle_uncompiled(handlers, etel):
+    """
+    Render etel using handlers, an uncompiled handlers table.
+    This builds ofc1 and ofc2 for every element, whether or not its handler
+    needs them. It is the reference against which handle is benchmarked.
+    """
+    ofc1_raw = []
+    ofc2 = {}
+    for child in etel:
+        output_for_child = handle_uncompiled(handlers, child)
+        ofc1_raw.extend(output_for_child)
+        ofc2[child] = output_for_child
+    ofc1 = _ofc1_from_raw(etel, ofc1_raw)
+    handler = handlers[etel.tag, etel.attrib.get("class")]
+    return shrink.shrink(handler(etel, ofc1, ofc2))
+
+
+def _handle_layers(chandlers_seq, etel, chandlers_for_key):
+    key_varies = not _all_same(chandlers_for_key)
+    if not key_varies and not chandlers_for_key[0].wants_children():
+        for chandlers in chandlers_seq:
+            _check_descendants(chandlers, etel)
+        output = _apply(chandlers_for_key[0], etel, None)
+        return (output,) * len(chandlers_seq)
+    ofcs_for_children = [handle_layers(chandlers_seq, child) for child in etel]
+    if not key_varies and all(map(_is_shared, ofcs_for_children)):
+        outputs_for_children = [ofcs[0] for ofcs in ofcs_for_children]
+        output = _apply(chandlers_for_key[0], etel, outputs_for_children)
+        return (output,) * len(chandlers_seq)
+    return tuple(
+        _apply(chandler, etel, [ofcs[idx] for ofcs in ofcs_for_children])
+        for idx, chandler in enumerate(chandlers_for_key)
+    )
+
+
+def _compile_handler(handler):
+    needed = getattr(handler, "walker_needs", _CHILD_OUTPUTS)
+    wants_ofc1 = "ofc1" in needed
+    wants_ofc2 = "ofc2" in needed
+    walk = _WALKS[wants_ofc1, wants_ofc2]
+    return CompiledHandler(handler, wants_ofc1, wants_ofc2, walk)
+
+
+# The walk functions below are at module level, rather than being closures
+# over the handler, so that compiled tables can be pickled, e.g. to be sent
+# to the worker processes of a process pool.
+
+
+def _walk_neither(chandler, chandlers, etel):
+    if len(etel):
+        _check_descendants(chandlers, etel)
+    return shrink.shrink(chandler.handler(etel, None, None))
+
+
+def _walk_ofc1(chandler, chandlers, etel):
+    ofc1_builder = shrink.Builder()
+    for child in etel:
+        ofc1_builder.extend(handle(chandlers, child))
+    ofc1 = _ofc1_from_builder(etel, ofc1_builder)
+    return shrink.shrink(chandler.handler(etel, ofc1, None))
+
+
+def _walk_ofc2(chandler, chandlers, etel):
+    ofc2 = {child: handle(chandlers, child) for child in etel}
+    return shrink.shrink(chandler.handler(etel, None, ofc2))
+
+
+def _walk_both(chandler, chandlers, etel):
+    ofc2 = {child: handle(chandlers, child) for child in etel}
+    ofc1_builder = shrink.Builder()
+    for output_for_child in ofc2.values():
+        ofc1_builder.extend(output_for_child)
+    ofc1 = _ofc1_from_builder(etel, ofc1_builder)
+    return shrink.shrink(chandler.handler(etel, ofc1, ofc2))
+
+
+def _walk_timed(chandler, chandlers, etel):
+    return _timed(chandler.key, len, chandler.untimed_walk, chandler, chandlers, etel)
+
+
+def _timed(key, output_len, func, *args):
+    """
+    Call func(*args), adding the time it takes to the timing of key.
+    output_len gives the length of func's output.
+    """
+    _CHILD_SECS_STACK.append(0.0)
+    start = time.perf_counter()
+    output = func(*args)
+    secs = time.perf_counter() - start
+    child_secs = _CHILD_SECS_STACK.pop()
+    if _CHILD_SECS_STACK:
+        _CHILD_SECS_STACK[-1] += secs
+    timing = _TIMINGS.get(key)
+    if timing is None:
+        timing = _TIMINGS[key] = {
+            "calls": 0,
+            "cum-secs": 0.0,
+            "self-secs": 0.0,
+            "outputs": 0,
+        }
+    timing["calls"] += 1
+    timing["cum-secs"] += secs
+    timing["self-secs"] += secs - child_secs
+    timing["outputs"] += output_len(output)
+    return output
+
+
+# _TIMINGS is as returned by take_timings. _CHILD_SECS_STACK has, for each
+# timed call in progress, the time spent so far in its children's calls.
+_TIMINGS = {}
+_CHILD_SECS_STACK = []
+_CHILD_OUTPUTS = frozenset(("ofc1", "ofc2"))
+_WALKS = {
+    # (wants_ofc1, wants_ofc2): walk function
+    (False, False): _walk_neither,
+    (True, False): _walk_ofc1,
+    (False, True): _walk_ofc2,
+    (True, True): _walk_both,
+}
+
+
+def _apply(chandler, etel, outputs_for_children):
+    ofc1 = None
+    ofc2 = None
+    if chandler.wants_ofc1:
+        ofc1_builder = shrink.Builder()
+        for output_for_child in outputs_for_children:
+            ofc1_builder.extend(output_for_child)
+        ofc1 = _ofc1_from_builder(etel, ofc1_builder)
+    if chandler.wants_ofc2:
+        ofc2 = dict(zip(etel, outputs_for_children))
+    return shrink.shrink(chandler.handler(etel, ofc1, ofc2))
+
+
+def _check_descendants(chandlers, etel):
+    """
+    Check that each descendant of etel has a handler in chandlers (raising
+    KeyError if not), as it would if it were rendered.
+    """
+    for child in etel:
+        for desc in child.iter():
+            _ = chandlers[desc.tag, desc.attrib.get("class")]
+
+
+def _ofc1_from_raw(etel, ofc1_raw):
+    ofc1 = shrink.shrink(ofc1_raw) if ofc1_raw else ofc1_raw
+    attr_text = etel.attrib.get("text")
+    if attr_text is not None:
+        assert not ofc1
+        ofc1 = [attr_text]
+    return ofc1
+
+
+def _ofc1_from_builder(etel, ofc1_builder):
+    ofc1 = ofc1_builder.build()
+    attr_text = etel.attrib.get("text")
+    if attr_text is not None:
+        assert not ofc1
+        ofc1 = [attr_text]
+    return ofc1
+
+
+def _all_same(chandlers):
+    return all(chandler == chandlers[0] for chandler in chandlers[1:])
+
+
+def _is_shared(outputs):
+    return all(output is outputs[0] for output in outputs[1:])
+
+
+def _layers_len(outputs):
+    """Return the total length of outputs, counting a shared output once."""
+    if _is_shared(outputs):
+        return len(outputs[0])
+    return sum(map(len, outputs))
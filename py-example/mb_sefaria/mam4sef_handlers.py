@@ -1,38 +1,72 @@
-"""Exports HANDLERS"""
+"""
+Exports:
+    HANDLERS
+    render_simple_verse
+"""
 
 from py_misc import my_html
 from mb_cmn import str_defs as sd
 from mb_cmn import hebrew_punctuation as hpu
 from mb_cmn import shrink
+from mb_sefaria import handler_walker
+
+# The elements that handlers always output the same way are made once, as
+# fragments (see my_html.fragment), whose serializations are made only once.
+# (The strings that handlers output alongside them, e.g. sd.THSP, are not
+# made into fragments, since they are joined with neighboring strings.)
+_SAMEKH_SPAN = my_html.fragment(my_html.span_c(("{ס}",), "mam-spi-samekh"))
+_PE_SPAN = my_html.fragment(my_html.span_c(("{פ}",), "mam-spi-pe"))
+_LINE_BREAK = my_html.fragment(my_html.line_break())
+_BOLD_PASOLEG = my_html.fragment(my_html.bold((hpu.PASOLEG,)))
+_SMALL_PASOLEG = my_html.fragment(my_html.small((hpu.PASOLEG,)))
+_IMPLICIT_MAQAF_SPAN = my_html.fragment(my_html.span_c([hpu.MAQ], "mam-implicit-maqaf"))
 
 # etel: ElementTree element
 # ofc1: output for all children, summed together
 # ofc2: output for all children, per child
+#
+# Each handler declares, with handler_walker.needs, which of ofc1 and ofc2 it
+# uses, so that the walker can avoid building the others. (A parameter that
+# a handler does not use is also named with a leading underscore, but that
+# is only style.)
 
 
+@handler_walker.needs("ofc1")
 def _verse(etel, ofc1, _ofc2):
     return ofc1 + _maybe_sampe(etel)
 
 
+def render_simple_verse(etel):
+    """
+    Render a simple verse, i.e. a verse with a text attribute and no
+    children. The output is the same as the walker would give via _verse,
+    but we get there directly.
+    """
+    return shrink.shrink([etel.attrib["text"], *_maybe_sampe(etel)])
+
+
+@handler_walker.needs()
 def _text(etel, _ofc1, _ofc2):
     return [etel.attrib["text"]]
 
 
+@handler_walker.needs()
 def _samekh2_or_3(_etel, _ofc1, _ofc2):
-    span = my_html.span_c(("{ס}",), "mam-spi-samekh")
-    return [sd.NBSP, span, sd.OCTO_NBSP]
+    return [sd.NBSP, _SAMEKH_SPAN, sd.OCTO_NBSP]
 
 
+@handler_walker.needs()
 def _pe2_or_3(_etel, _ofc1, _ofc2):
-    span = my_html.span_c(("{פ}",), "mam-spi-pe")
-    return [sd.NBSP, span, my_html.line_break()]
+    return [sd.NBSP, _PE_SPAN, _LINE_BREAK]
 
 
+@handler_walker.needs()
 def _samekh3_nin(_etel, _ofc1, _ofc2):
     """Handle a samekh3 element with class "nu10-invnun-neighbor" """
     return [sd.NBSP]
 
 
+@handler_walker.needs()
 def _invnun(etel, _ofc1, _ofc2):
     """
     Handle either of the following two types of invnun elements:
@@ -51,47 +85,60 @@ def _invnun(etel, _ofc1, _ofc2):
     return [span, *maybe_nbsp]
 
 
+@handler_walker.needs()
 def _legarmeih(_etel, _ofc1, _ofc2):
-    return [sd.THSP, my_html.bold((hpu.PASOLEG,))]
+    return [sd.THSP, _BOLD_PASOLEG]
 
 
+@handler_walker.needs()
 def _paseq(_etel, _ofc1, _ofc2):
-    return [sd.THSP, my_html.small((hpu.PASOLEG,)), sd.THSP]
+    return [sd.THSP, _SMALL_PASOLEG, sd.THSP]
 
 
+@handler_walker.needs()
 def _empty(_etel, _ofc1, _ofc2):
     return []
 
 
+@handler_walker.needs("ofc1")
 def _pass_thru(_etel, ofc1, _ofc2):
     return ofc1
 
 
+@handler_walker.needs("ofc1")
 def _letter_small(_etel, ofc1, _ofc2):
     return [my_html.small(ofc1)]
 
 
+@handler_walker.needs("ofc1")
 def _letter_large(_etel, ofc1, _ofc2):
     return [my_html.big(ofc1)]
 
 
+@handler_walker.needs("ofc1")
 def _letter_hung(_etel, ofc1, _ofc2):
     return [my_html.sup(ofc1)]
 
 
+@handler_walker.needs("ofc1")
 def _kq_trivial(_etel, ofc1, _ofc2):
     """Handle a trivial ketiv/qere element"""
     return [my_html.span_c(ofc1, "mam-kq-trivial")]
 
 
+@handler_walker.needs("ofc2")
 def _ketiv_qere(etel, _ofc1, ofc2):
     sep_dic = {"sep-maqaf": hpu.MAQ, None: " "}
     separator = sep_dic[etel.attrib.get("class")]
     k_or_q, q_or_k = ofc2.values()
-    inside = [*k_or_q, separator, *q_or_k]
+    inside = shrink.Builder()
+    inside.extend(k_or_q)
+    inside.append(separator)
+    inside.extend(q_or_k)
     return [my_html.span_c(inside, "mam-kq")]
 
 
+@handler_walker.needs("ofc1")
 def _ketiv(etel, ofc1, _ofc2):
     """
     Handle a ketiv element that is:
@@ -101,6 +148,7 @@ def _ketiv(etel, ofc1, _ofc2):
     return _ketiv_or_qere_helper("mam-kq-k", "()", ofc1)
 
 
+@handler_walker.needs()
 def _k_velo_q_maq(_etel, _ofc1, _ofc2):
     """
     Handle the rare-within-rare (2 cases) of maqaf after ketiv velo qere.
@@ -108,6 +156,7 @@ def _k_velo_q_maq(_etel, _ofc1, _ofc2):
     return [my_html.span(hpu.MAQ, {"class": "k-velo-q-maq"})]
 
 
+@handler_walker.needs("ofc1")
 def _qere(_etel, ofc1, _ofc2):
     """
     Handle a qere element that is:
@@ -117,6 +166,7 @@ def _qere(_etel, ofc1, _ofc2):
     return _ketiv_or_qere_helper("mam-kq-q", "[]", ofc1)
 
 
+@handler_walker.needs("ofc2")
 def _scrdfftar(etel, _ofc1, ofc2):
     target, _note = ofc2.values()
     # starpos = etel.attrib["sdt-starpos"]
@@ -127,6 +177,7 @@ def _scrdfftar(etel, _ofc1, ofc2):
     return target
 
 
+@handler_walker.needs("ofc1")
 def _scrdfftar_target(_etel, ofc1, _ofc2):
     return ofc1
 
@@ -139,12 +190,14 @@ def _scrdfftar_target(_etel, ofc1, _ofc2):
 #     return [el_sup, el_italic]
 
 
+@handler_walker.needs()
 def _shirah_space(_etel, _ofc1, _ofc2):
     return [sd.OCTO_NBSP]
 
 
+@handler_walker.needs()
 def _implicit_maqaf(_etel, _ofc1, _ofc2):
-    return [my_html.span_c([hpu.MAQ], "mam-implicit-maqaf")]
+    return [_IMPLICIT_MAQAF_SPAN]
 
 
 #######################################################################
@@ -156,8 +209,10 @@ def _paren(lst: list):
 
 
 def _ketiv_or_qere_helper(the_class, brackets, ofc1):
-    b0_ofc1_b1 = [brackets[0], *ofc1, brackets[1]]
-    contents = shrink.shrink(b0_ofc1_b1)
+    contents = shrink.Builder()
+    contents.append(brackets[0])
+    contents.extend(ofc1)
+    contents.append(brackets[1])
     return [my_html.span(contents, {"class": the_class})]
 
 
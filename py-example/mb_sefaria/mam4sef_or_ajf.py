@@ -1,31 +1,247 @@
-"""Exports main_helper"""
+"""
+Exports:
+    main_helper
+    input_path
+    compile_handlers
+    render_verse
+"""
 
+import datetime
 import os
-import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from py_misc import my_utils_for_mainish as my_utils_fm
 from py_misc import osis_book_abbrevs
 from mb_sefaria import sef_cmn
 from mb_cmn import bib_locales as tbn
+from mb_cmn import file_io
+from mb_cmn import out_staging
 from mb_cmn import provenance
 from py_misc import write_utils
 from mb_sefaria import write_utils_sef_or_ajf
-from mb_cmn import shrink
+from mb_sefaria import handler_walker
+from mb_sefaria import build_events
+from mb_sefaria import build_manifest
+from mb_sefaria import corpus_readers
+from mb_cmn import my_utils
+from py_misc import my_html
 
 
 def main_helper(variant):
     """Create the Sefaria MAM or AJF MAM from the XML MAM."""
-    bkids = my_utils_fm.get_bk39_tuple_from_argparse()
+    started = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    args = _get_args_from_argparse()
+    if args.corpus_reader:
+        variant = {**variant, "variant-corpus-reader": args.corpus_reader}
+    bkids = my_utils_fm.get_bk39_tuple_from_args(args)
     bkgs = osis_book_abbrevs.bk24_bkgs(bkids)
+    if not bkgs:
+        return
+    # We write to a staging tree, then commit it, so that readers of the
+    # outputs never see a mix of old and new ones (see out_staging).
+    out_dir = write_utils.out_dir(variant)
+    staging_dir = out_staging.begin(out_dir, _linkable_outputs(variant, out_dir))
+    variant = {**variant, "variant-out-dir": staging_dir}
     _write_output_provenance(variant, bkgs)
-    for bkg in bkgs:
-        _do_one_book_group(variant, bkg)
+    csv_dir = _csv_dir(variant, bkgs[0])
+    manifest_path = build_manifest.manifest_path(csv_dir)
+    manifest = build_manifest.load(manifest_path)
+    common_fp = build_manifest.common_fingerprint(variant, __file__)
+    fingerprints = _get_fingerprints(variant, common_fp, bkgs)
+    old_fingerprints = manifest["book-groups"]
+    bkgs_to_do = tuple(
+        bkg
+        for bkg in bkgs
+        if args.force
+        or not _is_up_to_date(variant, old_fingerprints, fingerprints, bkg)
+    )
+    # If only input XML has changed since the last build, we can reuse the
+    # outputs of the verses that are unchanged.
+    may_reuse = not args.force and manifest["common-fingerprint"] == common_fp
+    if args.time_handlers:
+        # The simple-verse fast path stands in for the handlers of a verse
+        # and its text, so, to time those handlers for every verse, we do
+        # without it. (This does not change the outputs, so we do it after
+        # taking the fingerprints.)
+        variant = {**variant, "variant-simple-verse-renderer": None}
+    chandlers_from_cant_dab = compile_handlers(variant, bool(args.time_handlers))
+    do_args = variant, chandlers_from_cant_dab, common_fp, may_reuse, args.validation
+    if args.jobs > 1:
+        bkg_results = _do_book_groups_in_pool(do_args, bkgs_to_do, args.jobs)
+    else:
+        bkg_results = [_do_one_book_group(*do_args, bkg) for bkg in bkgs_to_do]
+    new_fingerprints = {
+        bkg["bkg-name"]: fingerprints[bkg["bkg-name"]] for bkg in bkgs_to_do
+    }
+    if manifest["common-fingerprint"] != common_fp:
+        old_fingerprints = {}  # they were made by other code or another variant
+    build_manifest.save(
+        manifest_path, common_fp, {**old_fingerprints, **new_fingerprints}
+    )
+    skipped_count = len(bkgs) - len(bkgs_to_do)
+    my_utils_fm.show_progress_g(
+        __file__, f"skipped {skipped_count} unchanged book group(s)"
+    )
+    _show_path_counts([bkg_result["path-counts"] for bkg_result in bkg_results])
+    if args.time_handlers:
+        _report_handler_timings(args.time_handlers, bkg_results, skipped_count)
+    out_staging.commit(out_dir, staging_dir)
+    if args.events:
+        run_info = {"run-started": started, "vtrad": variant["variant-vtrad"]}
+        events = [event for result in bkg_results for event in result["stage-events"]]
+        build_events.append_events(args.events, run_info, events)
 
 
-def _write_output_provenance(variant, bkgs):
-    if not bkgs:
+def _get_args_from_argparse():
+    parser = my_utils_fm.mk_arg_parser()
+    parser.add_argument("--jobs", type=int, default=1)  # e.g. 8
+    # Without --force, we skip book groups that are unchanged since the last
+    # build, according to the build manifest (see build_manifest.py).
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--corpus-reader", choices=corpus_readers.CORPUS_READERS)
+    # With --time-handlers, we time each handler, and save the timings, as
+    # JSON, to the given file (see _report_handler_timings). Book groups that
+    # are skipped (see --force), and verses whose outputs are reused, are not
+    # timed.
+    parser.add_argument("--time-handlers")  # e.g. handler-timings.json
+    # With --events, we append stage events (see build_events.py), as JSON
+    # lines, to the given file.
+    parser.add_argument("--events")  # e.g. build-events.jsonl
+    # With --validation sampled or off, we check fewer (or none) of the
+    # elements we make (see my_html.set_validation_level). The checks can
+    # then be done, in full, by main_lint_mam4sef.py.
+    parser.add_argument(
+        "--validation", choices=my_html.VALIDATION_LEVELS, default="strict"
+    )
+    args = parser.parse_args()
+    assert args.jobs >= 1, args.jobs
+    return args
+
+
+def _do_book_groups_in_pool(do_args, bkgs, jobs):
+    # Book groups write disjoint sets of files, so the output does not
+    # depend on the order in which they finish. We submit the largest
+    # first so that a big book group (e.g. Ps) does not start last and
+    # become the straggler that sets the wall-clock time.
+    variant = do_args[0]
+    bkgs_lf = sorted(bkgs, key=lambda bkg: -_input_size(variant, bkg))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_do_one_book_group, *do_args, bkg) for bkg in bkgs_lf
+        ]
+        # result() also re-raises any exception from the worker
+        return [future.result() for future in futures]
+
+
+def _get_fingerprints(variant, common_fp, bkgs):
+    return {
+        bkg["bkg-name"]: build_manifest.bkg_fingerprint(
+            common_fp, input_path(variant, bkg["bkg-name"])
+        )
+        for bkg in bkgs
+    }
+
+
+def _is_up_to_date(variant, old_fingerprints, fingerprints, bkg):
+    bkg_name = bkg["bkg-name"]
+    if old_fingerprints.get(bkg_name) != fingerprints[bkg_name]:
+        return False
+    return all(map(os.path.exists, _output_paths(variant, bkg)))
+
+
+def _output_paths(variant, bkg):
+    for bkid in bkg["bkg-bkids"]:
+        sef_bkna = sef_cmn.SEF_BKNA[bkid]
+        yield write_utils.bkg_path(variant, sef_bkna)
+        yield write_utils.bkg_path(variant, sef_bkna, fmt_is_unicode_names=True)
+
+
+def _linkable_outputs(variant, out_dir):
+    """
+    Return the paths, relative to out_dir, of the outputs of all book
+    groups. Since we write these with file_io.with_tmp_openw, i.e. by
+    replacing them, they can be hard-linked into a staging tree (see
+    out_staging.begin). Other files, e.g. those written by provenance, are
+    copied.
+    """
+    all_bkgs = osis_book_abbrevs.bk24_bkgs(tbn.ALL_BK39_IDS)
+    return frozenset(
+        os.path.relpath(path, out_dir)
+        for bkg in all_bkgs
+        for path in _output_paths(variant, bkg)
+    )
+
+
+def _show_path_counts(path_counts_seq):
+    if not path_counts_seq:
         return
+    path_counts = {}
+    for bkg_path_counts in path_counts_seq:
+        for path, count in bkg_path_counts.items():
+            my_utils.increment_at_key(path_counts, path, count)
+    counts_str = ", ".join(f"{path}: {count}" for path, count in path_counts.items())
+    my_utils_fm.show_progress_g(__file__, "verses by path:", counts_str)
+
+
+def _report_handler_timings(out_path, bkg_results, skipped_count):
+    """
+    Show the handler timings (see handler_walker.take_timings), summed over
+    all book groups, sorted by self time, and save them, per book group, as
+    JSON to out_path. (Since they describe a run, not its outputs, they do
+    not go in the output directory.) Also show (and save) how many verses
+    were not timed, since their outputs were reused, and how many book
+    groups (skipped_count) were not timed, since they were skipped.
+    """
+    totals = {}
+    for bkg_result in bkg_results:
+        for key, timing in bkg_result["handler-timings"].items():
+            my_utils.maybe_init_at_key(totals, key, dict.fromkeys(timing, 0))
+            for what, amount in timing.items():
+                totals[key][what] += amount
+    by_self_secs = sorted(totals.items(), key=lambda kt: -kt[1]["self-secs"])
+    heads = "calls", "cum-secs", "self-secs", "outputs"
+    print(f"{'tag':<24} {'class':<24}", *(f"{head:>10}" for head in heads))
+    for (tag, the_class), timing in by_self_secs:
+        cells = timing["calls"], timing["cum-secs"], timing["self-secs"]
+        print(
+            f"{tag:<24} {the_class or '':<24}",
+            f"{cells[0]:>10} {cells[1]:>10.3f} {cells[2]:>10.3f}",
+            f"{timing['outputs']:>10}",
+        )
+    untimed_count = sum(map(_untimed_verse_count, bkg_results))
+    print(
+        f"not timed: {untimed_count} verse(s) reused,",
+        f"{skipped_count} book group(s) skipped",
+    )
+    dumpable = {
+        bkg_result["bkg-name"]: {
+            "handler-timings": {
+                f"{tag} {the_class or ''}".rstrip(): timing
+                for (tag, the_class), timing in bkg_result["handler-timings"].items()
+            },
+            "untimed-verses": _untimed_verse_count(bkg_result),
+        }
+        for bkg_result in bkg_results
+    }
+    file_io.json_dump_to_file_path(dumpable, out_path)
+    my_utils_fm.show_progress_g(__file__, "handler timings saved to", out_path)
+
+
+def _untimed_verse_count(bkg_result):
+    return bkg_result["path-counts"]["reuse of unchanged verse"]
+
+
+def _input_size(variant, bkg):
+    return os.path.getsize(input_path(variant, bkg["bkg-name"]))
+
+
+def _csv_dir(variant, bkg):
+    sample_name = sef_cmn.SEF_BKNA[bkg["bkg-bkids"][0]]
+    return os.path.dirname(write_utils.bkg_path(variant, sample_name))
+
+
+def _write_output_provenance(variant, bkgs):
     sample_name = sef_cmn.SEF_BKNA[bkgs[0]["bkg-bkids"][0]]
-    csv_dir = os.path.dirname(write_utils.bkg_path(variant, sample_name))
+    csv_dir = _csv_dir(variant, bkgs[0])
     unicode_dir = os.path.dirname(
         write_utils.bkg_path(variant, sample_name, fmt_is_unicode_names=True)
     )
@@ -41,63 +257,140 @@ def _write_output_provenance(variant, bkgs):
     )
 
 
-def _handle(handlers, etel):  # etel: ElementTree element
-    ofc1_raw = []  # output for all children, summed together
-    ofc2 = {}  # output for all children, per child
-    for child in etel:
-        output_for_child = _handle(handlers, child)
-        ofc1_raw.extend(output_for_child)
-        ofc2[child] = output_for_child
-    ofc1 = shrink.shrink(ofc1_raw)
-    attr_text = etel.attrib.get("text")
-    if attr_text is not None:
-        assert not ofc1
-        ofc1 = [attr_text]
-    tag_and_class = etel.tag, etel.attrib.get("class")
-    handler = handlers[tag_and_class]
-    return shrink.shrink(handler(etel, ofc1, ofc2))
-
-
-def _read_book_group(variant, bkg_name):
-    vtrad = variant["variant-vtrad"]
-    xml_vtrad_xxx_dic = {
-        tbn.VT_BHS: "xml-vtrad-bhs",
-        tbn.VT_SEF: "xml-vtrad-sef",
-    }
-    xml_vtrad_xxx = xml_vtrad_xxx_dic[vtrad]
-    xml_path = f"../MAM-simple/out/{xml_vtrad_xxx}/{bkg_name}.xml"
-    tree = ET.parse(xml_path)
-    return tree.getroot()
+def input_path(variant, bkg_name):
+    """Return the path of the input (e.g. XML) for book group bkg_name."""
+    return _corpus_reader(variant).path(variant["variant-vtrad"], bkg_name)
+
 
+def _corpus_reader(variant):
+    corpus_reader = variant.get("variant-corpus-reader") or "xml"
+    return corpus_readers.CORPUS_READERS[corpus_reader]
 
-XPATH_QUERY_FROM_CANT_DAB = {
-    # For cant_dual, we just look for all verses.
-    "rv-cant-combined": ".//verse",
-    # For cant_alef and cant_bet, we look for all verses that have a
+
+def _has_cant_all_three_child(verse):
+    return verse.find("cant-all-three") is not None
+
+
+_VERSE_FILTER_FROM_CANT_DAB = {
+    # For cant_dual, we want all verses.
+    "rv-cant-combined": lambda _verse: True,
+    # For cant_alef and cant_bet, we want all verses that have a
     # "cant-all-three" child.
-    "rv-cant-alef": ".//verse/cant-all-three/..",
-    "rv-cant-bet": ".//verse/cant-all-three/..",
+    "rv-cant-alef": _has_cant_all_three_child,
+    "rv-cant-bet": _has_cant_all_three_child,
 }
 
 
-def _process_book_group(variant, root, cant_dab):
+def compile_handlers(variant, timed=False):
+    """
+    Compile the handlers of the variant, returning a dict that maps each
+    cant_dab (e.g. "rv-cant-combined") of the variant to a compiled
+    handler table. If timed, the handlers are timed (see
+    handler_walker.take_timings).
+    """
     handlers = variant["variant-handlers"]
+    return {
+        cant_dab: handler_walker.compile_handlers(
+            _handlers_for_cant_dab(handlers, cant_dab), timed
+        )
+        for cant_dab in _get_cant_dabs(variant)
+    }
+
+
+def _process_book_group(variant, chandlers_from_cant_dab, bkg_name, old_verse_fps):
+    """
+    Render the verses of book group bkg_name, except for those whose
+    fingerprints are unchanged from old_verse_fps. For those, the output is
+    None, meaning "reuse the existing output". Also return the path counts,
+    the verse fingerprints, and the stage times (see build_events) of the
+    parse and render stages.
+    """
     vtrad = variant["variant-vtrad"]
-    if tuple(handlers.keys()) == _ALL_3_CANT_DAB_VALUES:
-        handlers2 = handlers[cant_dab]
-    else:
-        handlers2 = handlers
-    verses_in = root.findall(XPATH_QUERY_FROM_CANT_DAB[cant_dab])
-    bk39s_out = {}
-    for verse in verses_in:
+    bkg_out = {}
+    path_counts = {path: 0 for path in _VERSE_PATHS}
+    verse_fps = {}
+    stage_times = {}
+    verses = _corpus_reader(variant).iter_verses(input_path(variant, bkg_name))
+    while True:
+        start = build_events.clock()
+        verse = next(verses, None)
+        verse_count = 0 if verse is None else 1
+        build_events.add_time(
+            stage_times, ("parse", None), build_events.since(start), verse_count
+        )
+        if verse is None:
+            break
         osis_id = verse.attrib["osisID"]
         bcvt = _get_bcvt_from_osis_id(vtrad, osis_id)
         bkid = tbn.bcvt_get_bk39id(bcvt)
-        verse_out = _handle(handlers2, verse)
-        if bkid not in bk39s_out:
-            bk39s_out[bkid] = []
-        bk39s_out[bkid].append((bcvt, verse_out))
-    return bk39s_out
+        my_utils.maybe_init_at_key(bkg_out, bkid, {})
+        verse_fps[osis_id] = build_manifest.verse_fingerprint(verse)
+        if old_verse_fps.get(osis_id) == verse_fps[osis_id]:
+            my_utils.append_at_key(bkg_out[bkid], "rv-cant-combined", (bcvt, None))
+            path_counts["reuse of unchanged verse"] += 1
+            continue
+        path_counts[_verse_path(variant, verse)] += 1
+        start = build_events.clock()
+        verse_outs = render_verse(variant, chandlers_from_cant_dab, verse)
+        elapsed = build_events.since(start)
+        for cant_dab, verse_out in verse_outs.items():
+            # When a verse is rendered in several layers at once, we split
+            # the time evenly among them.
+            share = 1 / len(verse_outs)
+            build_events.add_time(
+                stage_times, ("render", cant_dab), elapsed, share=share
+            )
+            my_utils.append_at_key(bkg_out[bkid], cant_dab, (bcvt, verse_out))
+    return bkg_out, path_counts, verse_fps, stage_times
+
+
+def render_verse(variant, chandlers_from_cant_dab, verse):
+    """
+    Render a verse, returning a dict that maps each cant_dab (layer) the
+    verse is in to its output. (chandlers_from_cant_dab is as returned by
+    compile_handlers.)
+    """
+    if _verse_path(variant, verse) == "simple-verse fast path":
+        # A simple verse has no cant-all-three child, so it is only
+        # in the rv-cant-combined layer.
+        render_simple_verse = variant["variant-simple-verse-renderer"]
+        return {"rv-cant-combined": render_simple_verse(verse)}
+    verse_cant_dabs = tuple(
+        cant_dab
+        for cant_dab in chandlers_from_cant_dab
+        if _VERSE_FILTER_FROM_CANT_DAB[cant_dab](verse)
+    )
+    if len(verse_cant_dabs) == 1:
+        chandlers = chandlers_from_cant_dab[verse_cant_dabs[0]]
+        verse_outs = (handler_walker.handle(chandlers, verse),)
+    else:
+        chandlers_seq = tuple(map(chandlers_from_cant_dab.get, verse_cant_dabs))
+        verse_outs = handler_walker.handle_layers(chandlers_seq, verse)
+    return dict(zip(verse_cant_dabs, verse_outs))
+
+
+def _verse_path(variant, verse):
+    """Return which of the _VERSE_PATHS (other than reuse) renders verse."""
+    if variant.get("variant-simple-verse-renderer") and _is_simple_verse(verse):
+        return "simple-verse fast path"
+    return "general walker"
+
+
+def _is_simple_verse(verse):
+    """
+    Return whether this verse has its whole text in a text attribute,
+    and therefore no children. (Most verses are like this.)
+    """
+    return "text" in verse.attrib and not len(verse)
+
+
+_VERSE_PATHS = "simple-verse fast path", "general walker", "reuse of unchanged verse"
+
+
+def _handlers_for_cant_dab(handlers, cant_dab):
+    if tuple(handlers.keys()) == _ALL_3_CANT_DAB_VALUES:
+        return handlers[cant_dab]
+    return handlers
 
 
 def _get_bcvt_from_osis_id(vtrad, osid_id):
@@ -105,34 +398,85 @@ def _get_bcvt_from_osis_id(vtrad, osid_id):
     return tbn.mk_bcvtxxx(bkid, chnu, vrnu, vtrad)
 
 
-def _do_for_cant_dab(bkg_out, variant, root, cant_dab):
-    bk39s = _process_book_group(variant, root, cant_dab)
-    for bkid, verses in bk39s.items():
-        if bkid not in bkg_out:
-            bkg_out[bkid] = {}
-        bkg_out[bkid][cant_dab] = verses
+def _get_cant_dabs(variant):
+    if variant.get("variant-include-abcants"):
+        return _ALL_3_CANT_DAB_VALUES
+    return ("rv-cant-combined",)
 
 
-def _do_one_book_group(variant, bkg):
-    """Do the book group bkg"""
+def _do_one_book_group(
+    variant, chandlers_from_cant_dab, common_fp, may_reuse, validation, bkg
+):
+    """
+    Do the book group bkg.
+    If may_reuse, reuse the existing outputs of verses that are unchanged,
+    if those outputs were made by code and a variant with the common
+    fingerprint common_fp (see build_manifest.load_verse_fingerprints).
+    Validate the elements made at the given level (see
+    my_html.set_validation_level).
+    Return a dict with the book group's name, its path counts (see
+    _VERSE_PATHS), its handler timings (see handler_walker.take_timings),
+    which are empty unless the handlers are timed, and its stage events (see
+    build_events).
+    """
+    my_html.set_validation_level(validation)
     bkg_name = bkg["bkg-name"]
-    root = _read_book_group(variant, bkg_name)
-    bkg_out = {}
-    if variant.get("variant-include-abcants"):
-        cant_dabs = _ALL_3_CANT_DAB_VALUES
+    cant_dabs = tuple(chandlers_from_cant_dab)
+    verse_fps_path = build_manifest.verse_fingerprints_path(
+        _csv_dir(variant, bkg), bkg_name
+    )
+    if may_reuse and all(map(os.path.exists, _output_paths(variant, bkg))):
+        old_verse_fps = build_manifest.load_verse_fingerprints(
+            verse_fps_path, common_fp
+        )
     else:
-        cant_dabs = ("rv-cant-combined",)
-    for cant_dab in cant_dabs:
-        _do_for_cant_dab(bkg_out, variant, root, cant_dab)
+        old_verse_fps = {}
+    bkg_out, path_counts, verse_fps, stage_times = _process_book_group(
+        variant, chandlers_from_cant_dab, bkg_name, old_verse_fps
+    )
+    handler_timings = handler_walker.take_timings()
+    bytes_written = {("csv", None): 0, ("unicode-names", None): 0}
     for bkid, cant_to_verses in bkg_out.items():
         sef_bkna = sef_cmn.SEF_BKNA[bkid]
         csv_path = write_utils.bkg_path(variant, sef_bkna)
+        un_path = write_utils.bkg_path(variant, sef_bkna, fmt_is_unicode_names=True)
+        kept_rows = None
+        kept_blocks = None
+        if any(body is None for _bcvt, body in cant_to_verses["rv-cant-combined"]):
+            kept_rows = write_utils_sef_or_ajf.read_rows_of_bkg_in_csv_fmt(csv_path)
+            kept_blocks = write_utils.read_blocks_of_bkg_in_un_fmt(variant, sef_bkna)
+        verse_count = len(cant_to_verses["rv-cant-combined"])
+        start = build_events.clock()
         write_utils_sef_or_ajf.write_bkg_in_csv_fmt(
-            csv_path, variant, cant_to_verses, cant_dabs
+            csv_path, variant, cant_to_verses, cant_dabs, kept_rows
         )
+        elapsed = build_events.since(start)
+        build_events.add_time(stage_times, ("csv", None), elapsed, verse_count)
+        bytes_written["csv", None] += os.path.getsize(csv_path)
+        start = build_events.clock()
         write_utils.write_bkg_in_un_fmt(
-            variant, sef_bkna, cant_to_verses, "rv-cant-combined"
+            variant, sef_bkna, cant_to_verses, "rv-cant-combined", kept_blocks
+        )
+        elapsed = build_events.since(start)
+        build_events.add_time(
+            stage_times, ("unicode-names", None), elapsed, verse_count
         )
+        bytes_written["unicode-names", None] += os.path.getsize(un_path)
+    # We save these only after the outputs, so that they never describe
+    # outputs that have not been written.
+    build_manifest.save_verse_fingerprints(verse_fps_path, common_fp, verse_fps)
+    stage_events = [
+        build_events.stage_event(
+            bkg_name, stage_key, times, bytes_written.get(stage_key, 0)
+        )
+        for stage_key, times in stage_times.items()
+    ]
+    return {
+        "bkg-name": bkg_name,
+        "path-counts": path_counts,
+        "handler-timings": handler_timings,
+        "stage-events": stage_events,
+    }
 
 
 _ALL_3_CANT_DAB_VALUES = "rv-cant-combined", "rv-cant-alef", "rv-cant-bet"
@@ -0,0 +1,240 @@
+"""
+Exports:
+    LruCache
+    make_server
+
+A long-running local HTTP server that renders verses the same way
+mam4sef_or_ajf does, i.e. with the same handlers and the same HTML
+serialization as the CSV cells. It saves us the interpreter start-up and
+the full parse that running main_mam4sef.py costs on every request.
+
+A request looks like this:
+    GET /verses?ref=Gen.1.1
+    GET /verses?ref=Gen.1&vtrad=vtbhs
+    GET /verses?ref=Gen.1.1-Gen.2.3
+The ref is an osisID of a verse or chapter, or a range of verses (from one
+verse to another, in the same book group). The vtrad (e.g. vtmam) may be
+any of those of corpus_readers.VTRADS, and defaults to that of the
+variant. The response is an HTML document with one <div> per verse
+per layer (cant_dab).
+
+The server finds verses through verse indexes (see xml_verse_index), so it
+parses only the requested verses (or chapter), not their whole book group.
+It keeps two bounded LRU caches: one of verse indexes, one per book group,
+and one of rendered verses. A verse index is keyed by the size and
+modification time of its XML, so a changed XML file is indexed again. A
+rendered verse is keyed by its fingerprint (see build_manifest), so an
+unchanged verse stays cached even if other verses of its book group change.
+
+Responses carry an ETag computed from the rendering code, the variant, and
+the fingerprints of the requested verses, so a client that sends it back in
+If-None-Match gets a 304 without the verses being rendered at all.
+
+A request that fails, other than by being bad, gets a 500, and the error is
+logged (see BaseHTTPRequestHandler.log_error), with its traceback.
+
+The server needs no external services. It handles one request at a time.
+"""
+
+import hashlib
+import html
+import os
+import traceback
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from mb_sefaria import build_manifest
+from mb_sefaria import corpus_readers
+from mb_sefaria import mam4sef_or_ajf
+from mb_sefaria import xml_verse_index
+from py_misc import my_html
+from py_misc import osis_book_abbrevs
+
+
+class LruCache:
+    """
+    A dict-like cache that holds at most maxsize items. If on_evict is
+    given, it is called with each item that is evicted.
+    """
+
+    def __init__(self, maxsize, on_evict=None):
+        assert maxsize >= 1, maxsize
+        self._maxsize = maxsize
+        self._on_evict = on_evict
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get_or_make(self, key, make_fun, *args):
+        """
+        Return the item at key, first making it with make_fun(*args) if it
+        is not there. Either way, it becomes the most recently used item.
+        """
+        if key in self._items:
+            self._items.move_to_end(key)
+            return self._items[key]
+        item = make_fun(*args)
+        self._items[key] = item
+        if len(self._items) > self._maxsize:
+            _key, evicted = self._items.popitem(last=False)
+            if self._on_evict is not None:
+                self._on_evict(evicted)
+        return item
+
+
+def make_server(variant, server_address, bkg_cache_size=8, verse_cache_size=4096):
+    """
+    Make an HTTPServer, at server_address (a (host, port) pair), that
+    renders verses according to the variant. Call its serve_forever method
+    to run it.
+    """
+    renderer = _Renderer(variant, bkg_cache_size, verse_cache_size)
+
+    class RequestHandler(_RequestHandler):
+        """A _RequestHandler bound to our _Renderer."""
+
+        the_renderer = renderer
+
+    return HTTPServer(server_address, RequestHandler)
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class _Renderer:
+    def __init__(self, variant, bkg_cache_size, verse_cache_size):
+        self.variant = variant
+        self.chandlers_from_cant_dab = mam4sef_or_ajf.compile_handlers(variant)
+        driver_path = mam4sef_or_ajf.__file__
+        self.common_fp = build_manifest.common_fingerprint(variant, driver_path)
+        self.index_cache = LruCache(bkg_cache_size, xml_verse_index.VerseIndex.close)
+        self.verse_cache = LruCache(verse_cache_size)
+
+    def verses(self, vtrad, ref):
+        """Return the <verse> elements that ref (e.g. "Gen.1") refers to."""
+        first_id, _, last_id = ref.partition("-")
+        path = self._xml_path(vtrad, first_id)
+        index = self._verse_index(path)
+        if not last_id:
+            if first_id not in index:
+                raise _BadRequest(f"no such chapter or verse: {first_id}")
+            etel = index.element(first_id)
+            return (etel,) if etel.tag == "verse" else tuple(etel.iter("verse"))
+        if self._xml_path(vtrad, last_id) != path:
+            raise _BadRequest(f"range spans book groups: {ref}")
+        ids = index.verse_osis_ids()
+        if first_id not in ids or last_id not in ids:
+            raise _BadRequest(f"range ends must be verses: {ref}")
+        start, stop = ids.index(first_id), ids.index(last_id) + 1
+        if start >= stop:
+            raise _BadRequest(f"range is backwards: {ref}")
+        return tuple(map(index.element, ids[start:stop]))
+
+    def etag(self, vtrad, verses):
+        """Return an ETag for the rendering of the given verses."""
+        fps = (build_manifest.verse_fingerprint(verse) for verse in verses)
+        hasher = hashlib.sha256("\n".join((self.common_fp, vtrad)).encode())
+        for osis_id_and_fp in zip((v.attrib["osisID"] for v in verses), fps):
+            hasher.update(repr(osis_id_and_fp).encode())
+        return f'"{hasher.hexdigest()}"'
+
+    def html_doc(self, vtrad, ref, verses):
+        """Return an HTML document of the rendering of the given verses."""
+        divs = []
+        for verse in verses:
+            osis_id = verse.attrib["osisID"]
+            for cant_dab, html_str in self._rendered_verse(vtrad, verse).items():
+                attr = f'id="{html.escape(osis_id)}" class="{cant_dab}"'
+                divs.append(f"<div {attr}>{html_str}</div>")
+        return "\n".join(
+            (
+                "<!doctype html>",
+                '<html lang="he">',
+                '<head><meta charset="utf-8">',
+                f"<title>{html.escape(ref)}</title></head>",
+                "<body>",
+                *divs,
+                "</body>",
+                "</html>",
+                "",
+            )
+        )
+
+    def _xml_path(self, vtrad, osis_id):
+        if vtrad not in corpus_readers.VTRADS:
+            raise _BadRequest(f"no such vtrad: {vtrad}")
+        oba = osis_id.split(".")[0]
+        if oba not in osis_book_abbrevs.BK39ID_FROM_OBA:
+            raise _BadRequest(f"no such book: {oba}")
+        return xml_verse_index.xml_path_of_osis_id(vtrad, osis_id)
+
+    def _verse_index(self, path):
+        stat = os.stat(path)
+        key = path, stat.st_size, stat.st_mtime_ns
+        return self.index_cache.get_or_make(key, xml_verse_index.VerseIndex, path)
+
+    def _rendered_verse(self, vtrad, verse):
+        fingerprint = build_manifest.verse_fingerprint(verse)
+        key = vtrad, verse.attrib["osisID"], fingerprint
+        return self.verse_cache.get_or_make(key, self._render_verse, vtrad, verse)
+
+    def _render_verse(self, vtrad, verse):
+        variant = {**self.variant, "variant-vtrad": vtrad}
+        verse_outs = mam4sef_or_ajf.render_verse(
+            variant, self.chandlers_from_cant_dab, verse
+        )
+        return {
+            cant_dab: my_html.els_to_str_for_sef(html_els)
+            for cant_dab, html_els in verse_outs.items()
+        }
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    the_renderer: _Renderer
+
+    def do_GET(self):
+        """Handle a GET request."""
+        url = urlsplit(self.path)
+        if url.path != "/verses":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        try:
+            etag, body = self._etag_and_body(parse_qs(url.query))
+        except _BadRequest as exc:
+            self.send_error(HTTPStatus.BAD_REQUEST, str(exc))
+            return
+        except Exception as exc:  # e.g. a handler failing on an unexpected verse
+            self.log_error("error handling %s: %r", self.path, exc)
+            traceback.print_exc()
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+        if body is None:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _etag_and_body(self, query):
+        """
+        Return the ETag and body of the response to a request with the
+        given query. The body is None if the client has the response
+        already (i.e. it sent the ETag in If-None-Match).
+        """
+        refs = query.get("ref") or [""]
+        vtrads = query.get("vtrad") or [self.the_renderer.variant["variant-vtrad"]]
+        verses = self.the_renderer.verses(vtrads[0], refs[0])
+        etag = self.the_renderer.etag(vtrads[0], verses)
+        if self.headers.get("If-None-Match") == etag:
+            return etag, None
+        body = self.the_renderer.html_doc(vtrads[0], refs[0], verses).encode()
+        return etag, body
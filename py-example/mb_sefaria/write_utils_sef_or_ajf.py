@@ -1,6 +1,7 @@
 """
 Exports:
     write_bkg_in_csv_fmt
+    read_rows_of_bkg_in_csv_fmt
 """
 
 import csv
@@ -12,16 +13,23 @@ from mb_sefaria import sef_cmn
 from mb_cmn import bib_locales as tbn
 
 
-def write_bkg_in_csv_fmt(out_path, variant, verses, cant_dabs):
-    """Write Sefaria-style file in CSV format"""
+def write_bkg_in_csv_fmt(out_path, variant, verses, cant_dabs, kept_rows=None):
+    """
+    Write Sefaria-style file in CSV format.
+    A verse whose html_els are None is not rendered; instead, its row is
+    copied from kept_rows (see read_rows_of_bkg_in_csv_fmt).
+    """
     book_out = {}
     bkid = None
     verses_dicts = my_utils.dv_map(dict, verses)
-    for bcvt, _html_els in verses["rv-cant-combined"]:
+    for bcvt, html_els in verses["rv-cant-combined"]:
         if bkid is None:
             bkid = tbn.bcvt_get_bk39id(bcvt)
         else:
             assert bkid == tbn.bcvt_get_bk39id(bcvt)
+        if html_els is None:
+            book_out[bcvt] = kept_rows[_bcv_str(bcvt)]
+            continue
         book_out[bcvt] = tuple(
             _html_str(_maybe_get(verses_dicts, cant_dab, bcvt))
             for cant_dab in cant_dabs
@@ -31,13 +39,22 @@ def write_bkg_in_csv_fmt(out_path, variant, verses, cant_dabs):
     )
 
 
+def read_rows_of_bkg_in_csv_fmt(in_path):
+    """
+    Read a file written by write_bkg_in_csv_fmt, returning a dict that maps
+    each verse's reference (e.g. "Genesis 1:1") to the rest of its row.
+    """
+    with open(in_path, encoding="utf-8", newline="") as in_fp:
+        return {row[0]: tuple(row[1:]) for row in csv.reader(in_fp)}
+
+
 def _maybe_get(verses_dicts, cant_dab, bcvt):
     vd_cd = verses_dicts.get(cant_dab) or {}
     return vd_cd.get(bcvt)
 
 
 def _html_str(html_els):
-    return "".join(map(my_html.el_to_str_for_sef, html_els)) if html_els else ""
+    return my_html.els_to_str_for_sef(html_els) if html_els else ""
 
 
 def _write_callback(variant, bkid, contents, file_handle):
@@ -47,9 +64,12 @@ def _write_callback(variant, bkid, contents, file_handle):
         header = sef_header.sef_header(bkid)
         for hkey, hval in header.items():
             writer.writerow((hkey, hval))
-    sef_bkna = sef_cmn.SEF_BKNA[bkid]
     for bcvt, verse in contents.items():
-        chnu = tbn.bcvt_get_chnu(bcvt)
-        vrnu = tbn.bcvt_get_vrnu(bcvt)
-        bcv_str = f"{sef_bkna} {chnu}:{vrnu}"
-        writer.writerow((bcv_str, *verse))
+        writer.writerow((_bcv_str(bcvt), *verse))
+
+
+def _bcv_str(bcvt):
+    sef_bkna = sef_cmn.SEF_BKNA[tbn.bcvt_get_bk39id(bcvt)]
+    chnu = tbn.bcvt_get_chnu(bcvt)
+    vrnu = tbn.bcvt_get_vrnu(bcvt)
+    return f"{sef_bkna} {chnu}:{vrnu}"
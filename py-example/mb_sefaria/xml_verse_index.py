@@ -0,0 +1,153 @@
+"""
+Exports:
+    VerseIndex
+    build_index
+    xml_path_of_osis_id
+
+A verse index records, for an XML file of MAM-simple, the byte offsets of
+each <chapter> and <verse> element in it, keyed by osisID. With it, a
+VerseIndex can parse a single verse (or chapter) without parsing the rest
+of the file: it memory-maps the file and parses only that element's bytes.
+
+Indexes are kept in the cache directory (see corpus_readers.cache_path).
+Like the XML cache, an index records the hash of the XML it was built
+from, and it is rebuilt if that hash no longer matches.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import xml.etree.ElementTree as ET
+import xml.parsers.expat
+
+from mb_cmn import file_io
+from mb_sefaria import corpus_readers
+from py_misc import osis_book_abbrevs
+
+
+class VerseIndex:
+    """
+    Gives random access, by osisID, to the chapters and verses of the XML
+    file at xml_path. Use it as a context manager, or call close when done.
+    """
+
+    def __init__(self, xml_path):
+        index = _load_fresh_index(xml_path) or build_index(xml_path)
+        self._offsets = index["offsets"]
+        with open(xml_path, "rb") as in_fp:
+            self._mmap = mmap.mmap(in_fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc_info):
+        self.close()
+
+    def __contains__(self, osis_id):
+        return osis_id in self._offsets
+
+    def element(self, osis_id):
+        """
+        Return the <chapter> or <verse> element with the given osisID
+        (e.g. "Ps.119" or "Ps.119.1"), parsed from its bytes alone.
+        """
+        start, stop = self._offsets[osis_id]
+        return ET.fromstring(self._mmap[start:stop])
+
+    def verse_osis_ids(self):
+        """
+        Return the osisIDs of the verses (not the chapters), in the order in
+        which they appear in the XML file. (A verse's osisID has three
+        parts, e.g. "Ps.119.1", and a chapter's two, e.g. "Ps.119".)
+        """
+        verse_ids = (osis_id for osis_id in self._offsets if osis_id.count(".") == 2)
+        return sorted(verse_ids, key=lambda osis_id: self._offsets[osis_id][0])
+
+    def close(self):
+        """Release the memory map of the XML file."""
+        self._mmap.close()
+
+
+def build_index(xml_path):
+    """
+    Build the index of the XML file at xml_path, save it in the cache
+    directory, and return it. The index is a dict with:
+        "version": the version of the index format
+        "xml-sha256": the hash of the XML file
+        "offsets": a dict mapping each osisID to a [start, stop] pair of
+            byte offsets, i.e. the element is xml_bytes[start:stop]
+    """
+    with open(xml_path, "rb") as in_fp:
+        xml_bytes = in_fp.read()
+    index = {
+        "version": _INDEX_VERSION,
+        "xml-sha256": hashlib.sha256(xml_bytes).hexdigest(),
+        "offsets": _offsets(xml_bytes),
+    }
+    file_io.json_dump_to_file_path(index, corpus_readers.cache_path(xml_path, "json"))
+    return index
+
+
+def xml_path_of_osis_id(vtrad, osis_id):
+    """
+    Return the path of the XML file (in versification vtrad) that has the
+    chapter or verse with the given osisID, e.g. ../MAM-simple/out/
+    xml-vtrad-sef/Ps.xml for "Ps.119.1".
+    """
+    bkid = osis_book_abbrevs.BK39ID_FROM_OBA[osis_id.split(".")[0]]
+    (bkg,) = osis_book_abbrevs.bk24_bkgs((bkid,))
+    return corpus_readers.XML_READER.path(vtrad, bkg["bkg-name"])
+
+
+def _offsets(xml_bytes):
+    """
+    Return the byte offsets of the <chapter> and <verse> elements in
+    xml_bytes, keyed by osisID.
+
+    Expat tells us where each element's start tag starts. At the end of an
+    element, it tells us either where the end tag starts (e.g. </verse>),
+    or, for an empty element (e.g. <verse ... />), where the element ends.
+    """
+    parser = xml.parsers.expat.ParserCreate()
+    starts = []  # a stack of (osisID, start) pairs, or None for other tags
+    offsets = {}
+
+    def start_element(tag, attrib):
+        is_indexed = tag in _INDEXED_TAGS
+        starts.append(
+            (attrib["osisID"], parser.CurrentByteIndex) if is_indexed else None
+        )
+
+    def end_element(_tag):
+        osis_id_and_start = starts.pop()
+        if osis_id_and_start is None:
+            return
+        osis_id, start = osis_id_and_start
+        stop = parser.CurrentByteIndex
+        if xml_bytes.startswith(b"</", stop):
+            stop = xml_bytes.index(b">", stop) + 1
+        assert osis_id not in offsets, osis_id
+        offsets[osis_id] = [start, stop]
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.Parse(xml_bytes, True)
+    return offsets
+
+
+def _load_fresh_index(xml_path):
+    index_path = corpus_readers.cache_path(xml_path, "json")
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, encoding="utf-8") as in_fp:
+        index = json.load(in_fp)
+    with open(xml_path, "rb") as in_fp:
+        xml_sha256 = hashlib.sha256(in_fp.read()).hexdigest()
+    if (index["version"], index["xml-sha256"]) != (_INDEX_VERSION, xml_sha256):
+        return None
+    return index
+
+
+_INDEX_VERSION = 1  # Increment this when the index format changes.
+_INDEXED_TAGS = "chapter", "verse"
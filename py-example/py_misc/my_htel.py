@@ -0,0 +1,116 @@
+"""
+Exports:
+    HtEl
+    Fragment
+    htel_parts
+
+An HTML element ("htel") comes in either of two forms:
+    * the dict form, i.e. {"_htel_tag": tag, "attr": attr, "contents": contents},
+      where attr and contents are optional
+    * the compact form, i.e. an HtEl, which my_html.htel_mk makes
+
+Code that reads htels should get at their parts through htel_parts, so that
+it accepts both forms.
+
+A Fragment is an HtEl that is used as a constant (see my_html.fragment), so
+that its serializations can be made once and reused.
+"""
+
+import sys
+
+
+class HtEl:
+    """
+    A compact, immutable HTML element. Its tag and class name (if any) are
+    interned, so that the many elements that share them share one string.
+
+    For the sake of existing code that reads the dict form, an HtEl can
+    also be read as if it were one, e.g. html_el["_htel_tag"] or
+    html_el.get("attr").
+    """
+
+    __slots__ = ("tag", "attr", "contents")
+
+    def __init__(self, tag, attr=None, contents=None):
+        _set = object.__setattr__
+        _set(self, "tag", sys.intern(tag))
+        _set(self, "attr", _with_interned_class(attr))
+        _set(self, "contents", contents)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"HtEl is immutable (can't set {name})")
+
+    def __reduce__(self):
+        return HtEl, (self.tag, self.attr, self.contents)
+
+    def __eq__(self, other):
+        if not isinstance(other, (HtEl, dict)):
+            return NotImplemented
+        return htel_parts(self) == htel_parts(other)
+
+    __hash__ = None  # since attr and contents are not hashable
+
+    def __repr__(self):
+        return f"HtEl({self.tag!r}, {self.attr!r}, {self.contents!r})"
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key, default=None):
+        """Get a part by its key in the dict form."""
+        value = getattr(self, _ATTR_NAMES[key])
+        return default if value is None else value
+
+
+class Fragment(HtEl):
+    """
+    An HtEl used as a constant, e.g. the element that a handler always
+    outputs. Serializers that recognize a Fragment cache its serialization
+    in its serializations dict (keyed by format), and reuse it thereafter,
+    rather than serializing it again. Make Fragments with my_html.fragment,
+    which interns them.
+    """
+
+    __slots__ = ("serializations",)
+
+    def __init__(self, tag, attr=None, contents=None):
+        super().__init__(tag, attr, contents)
+        object.__setattr__(self, "serializations", {})
+
+    def __reduce__(self):
+        # Unpickle through my_html.fragment, so that the result is interned
+        # and has its single-line serialization cached, as serializers
+        # expect of a Fragment. (We import my_html here, not at the top,
+        # since my_html imports this module.)
+        from py_misc import my_html
+
+        return my_html.fragment, (HtEl(self.tag, self.attr, self.contents),)
+
+    def __repr__(self):
+        return f"Fragment({self.tag!r}, {self.attr!r}, {self.contents!r})"
+
+
+def htel_parts(html_el):
+    """Return the (tag, attr, contents) of an htel of either form."""
+    if isinstance(html_el, HtEl):
+        return html_el.tag, html_el.attr, html_el.contents
+    return html_el["_htel_tag"], html_el.get("attr"), html_el.get("contents")
+
+
+def _with_interned_class(attr):
+    if not attr or "class" not in attr:
+        return attr
+    the_class = attr["class"]
+    interned_class = sys.intern(the_class)
+    if interned_class is the_class:
+        return attr
+    return {**attr, "class": interned_class}
+
+
+_ATTR_NAMES = {"_htel_tag": "tag", "attr": "attr", "contents": "contents"}
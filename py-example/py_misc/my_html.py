@@ -7,9 +7,9 @@ from typing import Union
 
 from mb_cmn import file_io
 from py_misc import my_html_get_lines as hgl
+from py_misc import my_htel
 from mb_cmn import str_defs as sd
 from mb_cmn.my_utils import st_map
-from mb_cmn.my_utils import sum_of_map
 from mb_cmn import shrink
 
 
@@ -42,14 +42,36 @@ def write_html_to_file(body_contents, wc: WriteCtx):
 
 
 def el_to_str_for_sef(html_el):
-    hgl_opts = {
-        "hgl-add-wbr": False,
-        "hgl-max-line-len": -1,
-        "hgl-line-breaks-allowed": False,
-    }
-    lines = hgl.get_lines_from_html_el(hgl_opts, html_el)
-    assert len(lines) == 1
-    return lines[0]
+    """Serialize html_el as a single line, e.g. for a Sefaria CSV cell."""
+    return els_to_str_for_sef((html_el,))
+
+
+def fragment(html_el):
+    """
+    Return a Fragment (see my_htel) equal to html_el, for use as a constant.
+    Fragments are interned: equal ones are the same object. A Fragment is
+    made with its single-line serialization (see els_to_str_for_sef)
+    already cached.
+    """
+    html_str = el_to_str_for_sef(html_el)
+    frag = _FRAGMENTS.get(html_str)
+    if frag is None:
+        frag = my_htel.Fragment(*my_htel.htel_parts(html_el))
+        frag.serializations[hgl.SINGLE_LINE] = html_str
+        _FRAGMENTS[html_str] = frag
+    return frag
+
+
+def els_to_str_for_sef(html_els):
+    """
+    Serialize html_els as a single line, e.g. for a Sefaria CSV cell. This is
+    the same as joining the el_to_str_for_sef of each, but all the elements
+    are serialized into one buffer.
+    """
+    parts = []
+    for html_el in html_els:
+        hgl.append_single_line(html_el, parts)
+    return "".join(parts)
 
 
 def add_htel_to_etxml(etxml_parent, htel):
@@ -60,15 +82,16 @@ def add_htel_to_etxml(etxml_parent, htel):
     if isinstance(htel, str):
         ET.SubElement(etxml_parent, "text", {"text": htel})
         return
-    attr = htel.get("attr") or {}
+    tag, attr, contents = my_htel.htel_parts(htel)
+    attr = attr or {}
     tmp_attr = attr
-    if contents := htel.get("contents"):
+    if contents:
         assert isinstance(contents, (tuple, list))
         if _is_text_singleton(contents):
             assert "text" not in attr
             tmp_attr = dict(attr, text=contents[0])
             contents = None
-    xml_elem = ET.SubElement(etxml_parent, htel_get_tag(htel), tmp_attr)
+    xml_elem = ET.SubElement(etxml_parent, tag, tmp_attr)
     if contents:
         for contents_el in contents:
             add_htel_to_etxml(xml_elem, contents_el)
@@ -274,28 +297,54 @@ def line_break(attr=None):
 
 
 def flatten(flex_contents):
+    """
+    Flatten flex_contents, which is None, a string or htel, or a (possibly
+    nested) tuple or list of strings and htels, into a list of strings and
+    htels. (None flattens to None.)
+
+    This is iterative, appending to one list as it goes, so its time is
+    linear in the size of flex_contents, however deeply it is nested.
+    """
     if _is_str_or_htel(flex_contents):
         return [flex_contents]
-    if isinstance(flex_contents, (tuple, list)):
-        return sum_of_map(flatten, flex_contents)
-    assert flex_contents is None, flex_contents
-    return None
+    if flex_contents is None:
+        return None
+    assert isinstance(flex_contents, (tuple, list)), flex_contents
+    flat = []
+    stack = [iter(flex_contents)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, str):
+                flat.append(item)
+            elif isinstance(item, (tuple, list)):
+                stack.append(iter(item))
+                break
+            else:
+                assert is_htel(item), item
+                flat.append(item)
+        else:
+            stack.pop()
+    return flat
 
 
 def htel_mk(tag: str, attr=None, flex_contents=None):
-    """Make an HTML element"""
+    """
+    Make an HTML element, in its compact form (see my_htel).
+    The flex_contents may be a shrink.Builder, in which case it is built
+    (rather than flattened and shrunk, since a Builder's output is flat and
+    shrunk already).
+    """
     assert isinstance(tag, str)
     assert isinstance(attr, (type(None), dict))
-    flat_contents = flatten(flex_contents)
-    fs_contents = flat_contents and shrink.shrink(flat_contents)
-    if not (attr and "lt-space-okay" in attr):
-        _do_space_asserts(tag, fs_contents)
-    opts1 = {
-        "attr": attr,
-        "contents": fs_contents,
-    }
-    opts2 = {k: v for k, v in opts1.items() if v is not None}
-    return {"_htel_tag": tag, **opts2}
+    if isinstance(flex_contents, shrink.Builder):
+        fs_contents = flex_contents.build()
+    else:
+        flat_contents = flatten(flex_contents)
+        fs_contents = flat_contents and shrink.shrink(flat_contents)
+    if _should_validate():
+        problem = space_problem(tag, attr, fs_contents)
+        assert problem is None, problem
+    return my_htel.HtEl(tag, attr, fs_contents)
 
 
 def anchor_h(contents, href_val):
@@ -304,30 +353,72 @@ def anchor_h(contents, href_val):
 
 def htel_get_tag(html_el):
     """Get the tag of an HTML element."""
-    return html_el["_htel_tag"]
+    return my_htel.htel_parts(html_el)[0]
 
 
 def htel_get_class_attr(html_el):
     """Get the class attribute of an HTML element."""
-    return html_el["attr"]["class"]
+    return my_htel.htel_parts(html_el)[1]["class"]
+
+
+def set_validation_level(level):
+    """
+    Set how thoroughly htel_mk validates the elements it makes, i.e. checks
+    them with space_problem:
+        "strict": every element (the default)
+        "sampled": one element in _SAMPLING_PERIOD
+        "off": no elements
+    With validation off or sampled, main_lint_mam4sef.py can do the same
+    checks, in full, over the finished outputs.
+    """
+    assert level in VALIDATION_LEVELS, level
+    _VALIDATION["level"] = level
+
+
+def space_problem(tag, attr, contents):
+    """
+    Check the contents of an element (with the given tag and attr) for
+    leading or trailing space, and for double spaces. Return None if there
+    is no problem, otherwise a string describing the problem, e.g.
+    "double space in 'a  b', in 'x a  b y'".
+    """
+    if not contents or tag == "style":
+        return None
+    if attr and "lt-space-okay" in attr:
+        return None
+    if _has_lt_space(contents):
+        first, last = contents[0], contents[-1]
+        return f"leading or trailing space, in {first!r} ... {last!r}"
+    for htel in contents:
+        if isinstance(htel, str) and "  " in htel:
+            spaced, string = _double_space_helper(htel)
+            return f"double space in {spaced!r}, in {string!r}"
+    return None
 
 
 def is_htel(obj):
+    if isinstance(obj, my_htel.HtEl):
+        return True
     return isinstance(obj, dict) and "_htel_tag" in obj
 
 
 ###########################################################
 
 
-def _do_space_asserts(tag, fs_contents):
-    if not fs_contents:
-        return
-    if tag == "style":
-        return
-    assert not _has_lt_space(fs_contents), (fs_contents[0], fs_contents[-1])
-    for htel in fs_contents:
-        if isinstance(htel, str):
-            assert "  " not in htel, _double_space_helper(htel)
+def _should_validate():
+    level = _VALIDATION["level"]
+    if level == "strict":
+        return True
+    if level == "off":
+        return False
+    _VALIDATION["count"] += 1
+    return _VALIDATION["count"] % _SAMPLING_PERIOD == 0
+
+
+_FRAGMENTS = {}  # maps the single-line serialization of a fragment to it
+VALIDATION_LEVELS = "strict", "sampled", "off"
+_SAMPLING_PERIOD = 64
+_VALIDATION = {"level": "strict", "count": 0}
 
 
 def _double_space_helper(string: str):
@@ -360,8 +451,7 @@ def _write_callback(add_wbr, html_comment, html_el, out_fp):
         "hgl-max-line-len": 100,
         "hgl-line-breaks-allowed": True,
     }
-    lines = hgl.get_lines_from_html_el(hgl_opts, html_el)
-    out_fp.write("\n".join(lines))
+    hgl.write_html_el(hgl_opts, html_el, out_fp)
 
 
 def _is_text_singleton(array):  # "array": tuple or list
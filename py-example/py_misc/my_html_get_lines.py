@@ -1,77 +1,204 @@
+import functools
 import html
+import re
 from mb_cmn import hebrew_punctuation as hpu
 from mb_cmn import str_defs as sd
-from mb_cmn.my_utils import sum_of_map
+from py_misc import my_htel
+
+# The key under which a Fragment's serializations hold its single line (see
+# append_single_line)
+SINGLE_LINE = "single-line"
 
 
 def get_lines_from_html_el(hgl_opts, html_el):
-    io_paragraphs = [[""]]
-    max_line_len = hgl_opts["hgl-max-line-len"]
-    _el_to_paragraphs(hgl_opts, io_paragraphs, html_el)
-    return sum_of_map((_get_lines_from_words, max_line_len), io_paragraphs)
+    """Return the lines that write_html_el would write, as a list."""
+    pieces = []
+    breaks = []  # the index in pieces at which each new line starts
+    writer = _LineWriter(
+        pieces.append,
+        lambda: breaks.append(len(pieces)),
+        hgl_opts["hgl-max-line-len"],
+    )
+    _write_el(hgl_opts, writer, html_el)
+    writer.close()
+    starts = 0, *breaks
+    stops = *breaks, len(pieces)
+    return ["".join(pieces[start:stop]) for start, stop in zip(starts, stops)]
+
+
+def write_html_el(hgl_opts, html_el, out_fp):
+    """
+    Write html_el to out_fp, as lines joined by newlines. The output is
+    streamed, token by token, so memory use does not grow with the size of
+    html_el, and the line wrapping takes time linear in its size.
+    """
+    new_line = functools.partial(out_fp.write, "\n")
+    writer = _LineWriter(out_fp.write, new_line, hgl_opts["hgl-max-line-len"])
+    _write_el(hgl_opts, writer, html_el)
+    writer.close()
+
+
+def append_single_line(html_el, io_parts):
+    """
+    Append html_el, as the pieces of a single line, to io_parts. The line
+    is the one line that get_lines_from_html_el would return given options
+    that neither wrap lines, nor break them, nor add wbr elements (e.g. those
+    of a Sefaria CSV cell), but it is made without the machinery of words
+    and lines.
+    """
+    if isinstance(html_el, str):
+        outstr = _escape(html_el)
+        assert "\n" not in outstr, outstr
+        io_parts.append(outstr)
+        return
+    if type(html_el) is my_htel.Fragment:
+        io_parts.append(html_el.serializations[SINGLE_LINE])
+        return
+    eltag, attr, contents = my_htel.htel_parts(html_el)
+    io_parts.append(f"<{eltag}{_attr_str(attr)}>")
+    if contents:
+        assert isinstance(contents, (tuple, list))
+        if eltag == "style":
+            io_parts.extend(contents)
+        else:
+            for seq_el in contents:
+                append_single_line(seq_el, io_parts)
+    if eltag not in _NOCLOSE_SET:
+        io_parts.append(f"</{eltag}>")
+
+
+class _LineWriter:
+    """
+    Write words, wrapping them into lines no longer than max_line_len (or
+    not wrapping them, if max_line_len is -1). A word is built up from
+    pieces (e.g. a start tag and the text that follows it) until a space or
+    a paragraph break ends it. A word longer than max_line_len gets a line
+    of its own. A paragraph break always starts a new line.
+
+    Only the word being built is held back, and only while it is not yet
+    known whether it fits on the current line. The length of that line is
+    tracked as it grows, rather than being recomputed.
+    """
+
+    __slots__ = (
+        "_write",
+        "_new_line",
+        "_max_line_len",
+        "_line_len",
+        "_held",
+        "_holding",
+    )
+
+    def __init__(self, write, new_line, max_line_len):
+        self._write = write
+        self._new_line = new_line
+        self._max_line_len = max_line_len
+        self._line_len = 0  # of what has been written of the current line
+        self._held = []  # the pieces of the word being built, if held back
+        self._holding = False
 
+    def add_to_word(self, piece):
+        """Add piece to the word being built."""
+        if self._holding:
+            self._held.append(piece)
+        else:
+            self._write(piece)
+            self._line_len += len(piece)
+
+    def add_text(self, text):
+        """Add text, whose spaces separate words, to the word being built."""
+        assert "\n" not in text, text
+        if self._max_line_len == -1:
+            self._write(text)  # no wrapping, so no need to split it
+            return
+        words = text.split(" ")
+        self.add_to_word(words[0])
+        for word in words[1:]:
+            self.start_word()
+            self.add_to_word(word)
+
+    def start_word(self):
+        """End the word being built and start another, i.e. add a space."""
+        self._end_word()
+        if self._max_line_len == -1:
+            self._write(" ")
+        else:
+            self._holding = True
+
+    def start_paragraph(self):
+        """End the word being built and start a new line."""
+        self._end_word()
+        self._new_line()
+        self._line_len = 0
+
+    def close(self):
+        """End the word being built."""
+        self._end_word()
+
+    def _end_word(self):
+        if not self._holding:
+            return
+        self._holding = False
+        word = "".join(self._held)
+        self._held.clear()
+        if self._line_len + 1 + len(word) <= self._max_line_len:
+            self._write(" ")
+            self._line_len += 1
+        else:
+            self._new_line()
+            self._line_len = 0
+        self._write(word)
+        self._line_len += len(word)
 
-def _el_to_paragraphs(hgl_opts, io_paragraphs, html_el):
-    """Convert an HTML element to a string."""
+
+def _write_el(hgl_opts, writer, html_el):
+    """Write an HTML element (or a string) using writer."""
     add_wbr = hgl_opts["hgl-add-wbr"]
     if isinstance(html_el, str):
-        _add_str(io_paragraphs[-1], _finalize_string(add_wbr, html_el))
+        writer.add_text(_finalize_string(add_wbr, html_el))
         return
-    eltag = html_el["_htel_tag"]
-    attr_str = _attr_str(html_el.get("attr"))
-    _add_word(io_paragraphs[-1], f"<{eltag}{attr_str}>")
+    eltag, attr, contents = my_htel.htel_parts(html_el)
+    attr_str = _attr_str(attr)
+    writer.add_to_word(f"<{eltag}{attr_str}>")
     lb_allowed = hgl_opts["hgl-line-breaks-allowed"]
     if lb_allowed:
-        _maybe_start_new_paragraph(io_paragraphs, _LB1[eltag])
-    if contents := html_el.get("contents"):
+        _maybe_start_new_paragraph(writer, _LB1[eltag])
+    if contents:
         assert isinstance(contents, (tuple, list))
         for seq_el in contents:
             if eltag == "style":
-                _add_word(io_paragraphs[-1], seq_el)
+                writer.add_to_word(seq_el)
             else:
-                _el_to_paragraphs(hgl_opts, io_paragraphs, seq_el)
+                _write_el(hgl_opts, writer, seq_el)
     if eltag not in _NOCLOSE_SET:
-        _add_word(io_paragraphs[-1], f"</{eltag}>")
+        writer.add_to_word(f"</{eltag}>")
     if lb_allowed:
-        _maybe_start_new_paragraph(io_paragraphs, _LB2[eltag])
+        _maybe_start_new_paragraph(writer, _LB2[eltag])
 
 
 def _finalize_string(add_wbr, string):
-    outstr = string
-    outstr = html.escape(outstr, quote=False)
-    outstr = outstr.translate(_SSTT)
+    outstr = _escape(string)
     if add_wbr:
         outstr = outstr.replace(hpu.MAQ, hpu.MAQ + "<wbr>")
     return outstr
 
 
-def _add_str(io_paragraph, string: str):
-    assert "\n" not in string, string
-    words = string.split(" ")
-    _add_word(io_paragraph, words[0])
-    io_paragraph.extend(words[1:])
-
-
-def _add_word(io_paragraph, new_word: str):
-    io_paragraph[-1] += new_word
-
-
-def _maybe_start_new_paragraph(io_paragraphs, hts_lbn):
+def _maybe_start_new_paragraph(writer, hts_lbn):
     if hts_lbn == "\n":
-        io_paragraphs.append([""])
+        writer.start_paragraph()
     else:
         assert hts_lbn == ""
 
 
-def _get_lines_from_words(max_line_len, words):
-    out_lines = [words[0]]
-    for word in words[1:]:
-        new_last_line = out_lines[-1] + " " + word
-        if max_line_len == -1 or len(new_last_line) <= max_line_len:
-            out_lines[-1] = new_last_line
-        else:
-            out_lines.append(word)
-    return out_lines
+def _escape(string):
+    """
+    Escape string as html.escape(string, quote=False) would, and translate
+    its special spaces to entities. Most strings need neither, and finding
+    that out is much quicker than translating them.
+    """
+    if _TO_ESCAPE.search(string) is None:
+        return string
+    return string.translate(_ESCAPE_TT)
 
 
 def _attr_str(attr_dic):
@@ -94,6 +221,15 @@ _SSTT = str.maketrans(
         sd.NBSP: "&nbsp;",
     }
 )
+_ESCAPE_TT = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        **{chr(ordinal): entity for ordinal, entity in _SSTT.items()},
+    }
+)
+_TO_ESCAPE = re.compile("[" + "".join(map(chr, _ESCAPE_TT)) + "]")
 _NOCLOSE_TUPLE = "br", "hr", "meta", "link", "col", "img"
 _NOCLOSE_SET = {*_NOCLOSE_TUPLE}
 _LB2 = {
@@ -0,0 +1,70 @@
+"""
+Exports:
+    lint_html_str
+
+Lint serialized HTML, e.g. a cell of a Sefaria CSV file, doing the same
+checks that my_html.htel_mk does when it validates the elements it makes
+(see my_html.space_problem). This lets a build skip (or sample) those checks
+and have them done, in full, over its outputs afterwards.
+"""
+
+from html.parser import HTMLParser
+
+from py_misc import my_html
+
+
+def lint_html_str(html_str):
+    """
+    Parse html_str and check each of its elements with my_html.space_problem.
+    Return a list of (tag, problem) pairs, one per element with a problem.
+    """
+    parser = _Parser()
+    parser.feed(html_str)
+    parser.close()
+    assert len(parser.stack) == 1, f"unclosed {parser.stack[-1][0]}"
+    return parser.problems
+
+
+class _Parser(HTMLParser):
+    """
+    Gather the contents of each element as a list like the fs_contents of
+    my_html.htel_mk: strings, joined where adjacent, alternating with
+    (placeholders for) child elements.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # The stack holds a (tag, attr, contents) triple for each open
+        # element, below which is one for the top level.
+        self.stack = [(None, None, [])]
+        self.problems = []
+
+    def handle_starttag(self, tag, attrs):
+        self.stack[-1][2].append(_CHILD)
+        if tag in _VOID_TAGS:
+            return
+        self.stack.append((tag, dict(attrs), []))
+
+    def handle_startendtag(self, tag, attrs):
+        self.stack[-1][2].append(_CHILD)
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS:
+            return
+        open_tag, attr, contents = self.stack.pop()
+        assert open_tag == tag, (open_tag, tag)
+        problem = my_html.space_problem(tag, attr, contents)
+        if problem is not None:
+            self.problems.append((tag, problem))
+
+    def handle_data(self, data):
+        contents = self.stack[-1][2]
+        if contents and isinstance(contents[-1], str):
+            contents[-1] += data
+        else:
+            contents.append(data)
+
+
+_CHILD = ("child element",)  # not a str, as an element is not
+# The tags that my_html_get_lines writes without an end tag, plus wbr
+_VOID_TAGS = frozenset(("br", "hr", "meta", "link", "col", "img", "wbr"))
@@ -1,14 +1,27 @@
 import argparse
 import os
+import time
 
 from mb_cmn import bib_locales as tbn
 
 
 def get_bk39_tuple_from_argparse():
+    return get_bk39_tuple_from_args(mk_arg_parser().parse_args())
+
+
+def mk_arg_parser():
+    """
+    Make an argument parser that understands --book39 and --section6.
+    Callers can add their own arguments before parsing.
+    """
     parser = argparse.ArgumentParser()
     parser.add_argument("--book39")  # e.g. 1Samuel not I Samuel
     parser.add_argument("--section6")  # e.g. SifEm
-    args = parser.parse_args()
+    return parser
+
+
+def get_bk39_tuple_from_args(args):
+    """Get the bk39 tuple from args parsed by a parser from mk_arg_parser."""
     if args.book39:
         # I think there's a way to tell the argument parser that two arguments
         # are exclusive; if so perhaps I should use that instead of the assert
@@ -25,3 +38,21 @@ def show_progress_g(uufileuu, *rest):
     bn_uufileuu = os.path.basename(uufileuu)
     bn_and_rest = " ".join((bn_uufileuu, *rest))
     print(bn_and_rest)
+
+
+def time_best_of(repeats, fun, *args, mk_args=None):
+    """
+    Call fun repeats times, and return the output of the last call and the
+    best (least) time that a call took, in seconds. fun is called with args
+    or, if mk_args is given, with the args that mk_args returns, made afresh
+    (and not timed) before each call, e.g. since fun changes them.
+    """
+    best = None
+    for _ in range(repeats):
+        if mk_args is not None:
+            args = mk_args()
+        start = time.perf_counter()
+        output = fun(*args)
+        secs = time.perf_counter() - start
+        best = secs if best is None else min(best, secs)
+    return output, best
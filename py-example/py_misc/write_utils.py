@@ -1,10 +1,16 @@
 """
 Exports:
     write_bkg_in_un_fmt
+    read_blocks_of_bkg_in_un_fmt
     bkg_path
+    out_dir
 """
 
+import io
+import re
+
 from py_misc import my_html
+from py_misc import my_htel
 from mb_cmn import file_io
 from mb_cmn import my_utils
 from mb_cmn import uni_heb as uh
@@ -13,17 +19,53 @@ from mb_cmn import bib_locales as tbn
 from mb_cmn import str_defs as sd
 
 
-def write_bkg_in_un_fmt(variant, bkg_name, verses, rv_cant_that_covers):
-    """Write book group in "Unicode names" format."""
-    do_quick_test_of_get_pre_lines()
+def write_bkg_in_un_fmt(
+    variant, bkg_name, verses, rv_cant_that_covers, kept_blocks=None
+):
+    """
+    Write book group in "Unicode names" format.
+    A verse whose body is None is not written out from scratch; instead,
+    its block is copied from kept_blocks (see read_blocks_of_bkg_in_un_fmt).
+    """
     out_path = bkg_path(variant, bkg_name, fmt_is_unicode_names=True)
     title = f"unicode_names {bkg_name}"
     verses_dicts = my_utils.dv_map(dict, verses)
     file_io.with_tmp_openw(
-        out_path, {}, _write_callback, verses, rv_cant_that_covers, title, verses_dicts
+        out_path,
+        {},
+        _write_callback,
+        verses,
+        rv_cant_that_covers,
+        title,
+        verses_dicts,
+        kept_blocks,
     )
 
 
+def read_blocks_of_bkg_in_un_fmt(variant, bkg_name):
+    """
+    Read a file written by write_bkg_in_un_fmt, returning a dict that maps
+    the first line of each verse's block to the whole block.
+    """
+    in_path = bkg_path(variant, bkg_name, fmt_is_unicode_names=True)
+    blocks = {}
+    block_lines = []
+    with open(in_path, encoding="utf-8") as in_fp:
+        _title = in_fp.readline()
+        for line in in_fp:
+            block_lines.append(line)
+            if line == "\n":  # the blank line that ends a block
+                blocks[block_lines[0]] = "".join(block_lines)
+                block_lines = []
+    return blocks
+
+
+# With an indent, the key under which a Fragment's serializations hold its
+# text in "Unicode names" format (see _fragment_un_text)
+_UNICODE_NAMES = "unicode-names"
+_SEPS = " ", sd.NBSP
+_PRE_LINE_RE = re.compile(f"[{''.join(_SEPS)}]|[^{''.join(_SEPS)}]+")
+_SEP_LINES = {sep: uh.join_shunnas(sep) for sep in _SEPS}
 # Yes we could programmatically generate these but I want them to be
 # discoverable by search.
 _FOLDERS = {
@@ -77,14 +119,28 @@ def bkg_path(variant, bkg_name, fmt_is_unicode_names=False, fmt_override=None):
     path_qual = variant.get("variant-path-qual") or ""
     # path_qual examples include '' (the empty string) and 'vpq-ajf'
     folders = _FOLDERS[path_qual]
-    mam_for_xxx = variant.get("variant-mam-for-xxx") or "MAM-for-Sefaria"
-    parent = f"../{mam_for_xxx}/out"
+    parent = variant.get("variant-out-dir") or out_dir(variant)
     return f"{parent}/{folders[fmt]}/{bkg_name}{_EXTENSIONS[fmt]}"
 
 
-def _write_callback(verses, rv_cant_that_covers, title, verses_dicts, out_fp):
+def out_dir(variant):
+    """
+    Return the path of the directory where the outputs of variant go, e.g.
+    ../MAM-for-Sefaria/out. (Given a variant-out-dir, e.g. a staging tree
+    (see out_staging), bkg_path uses that instead.)
+    """
+    mam_for_xxx = variant.get("variant-mam-for-xxx") or "MAM-for-Sefaria"
+    return f"../{mam_for_xxx}/out"
+
+
+def _write_callback(
+    verses, rv_cant_that_covers, title, verses_dicts, kept_blocks, out_fp
+):
     out_fp.write(f"{title}\n")
-    for bcvt, _verse_body in verses[rv_cant_that_covers]:
+    for bcvt, verse_body in verses[rv_cant_that_covers]:
+        if verse_body is None:
+            out_fp.write(kept_blocks[_verse_header_line(bcvt)])
+            continue
         multiverse = {
             roca: verses_dicts[roca].get(bcvt)
             for roca in verses.keys()
@@ -95,9 +151,7 @@ def _write_callback(verses, rv_cant_that_covers, title, verses_dicts, out_fp):
 
 def _write_verse_un(out_fp, bcvt, multiverse):
     """Write verse in "unicode names" format"""
-    bkid, chnu, vrnu = tbn.bcvt_get_bcv_triple(bcvt)
-    vtrad = tbn.bcvt_get_vtrad(bcvt)
-    out_fp.write(f"{bkid} {chnu}:{vrnu} in vtrad {vtrad}\n")
+    out_fp.write(_verse_header_line(bcvt))
     for rv_cant, body in multiverse.items():
         if len(multiverse) > 1:
             _write_segments(out_fp, body, rv_cant)
@@ -106,6 +160,12 @@ def _write_verse_un(out_fp, bcvt, multiverse):
     out_fp.write("\n")
 
 
+def _verse_header_line(bcvt):
+    bkid, chnu, vrnu = tbn.bcvt_get_bcv_triple(bcvt)
+    vtrad = tbn.bcvt_get_vtrad(bcvt)
+    return f"{bkid} {chnu}:{vrnu} in vtrad {vtrad}\n"
+
+
 def _write_segments(out_fp, some_kind_of_verse, cant_dab=None, indent=""):
     if isinstance(some_kind_of_verse, (tuple, list)):
         html_els = some_kind_of_verse
@@ -125,19 +185,18 @@ def _write_segments_from_html_els(out_fp, html_els, cant_dab=None, indent=""):
         indent = "    "
     for html_el in html_els:
         if isinstance(html_el, str):
-            pre_lines = [html_el]
-            for sep in " ", sd.NBSP:
-                list_of_lists = [_get_pre_lines(sep, pl) for pl in pre_lines]
-                pre_lines = sum(list_of_lists, [])
-            for pre_line in pre_lines:
-                line = uh.join_shunnas(pre_line)
+            for pre_line in _pre_lines(html_el):
+                line = _SEP_LINES.get(pre_line) or uh.join_shunnas(pre_line)
                 out_fp.write(indent + line + "\n")
             continue
-        if isinstance(html_el, dict):
-            segtag = my_html.htel_get_tag(html_el)  # e.g. 'span'
-            attr = html_el.get("attr")
+        if type(html_el) is my_htel.Fragment:
+            out_fp.write(_fragment_un_text(html_el, indent))
+            continue
+        if my_html.is_htel(html_el):
+            segtag, attr, contents = my_htel.htel_parts(html_el)
+            # segtag is e.g. 'span'
             kev_strs = _key_eq_val_strs(attr or {})
-            if contents := html_el.get("contents"):
+            if contents:
                 out_fp.write(indent + _stasto("START", segtag, kev_strs))
                 _write_segments(out_fp, contents, None, indent)
                 out_fp.write(indent + _stasto("STOP", segtag, kev_strs))
@@ -147,6 +206,21 @@ def _write_segments_from_html_els(out_fp, html_els, cant_dab=None, indent=""):
         assert False, "instance of unexpected type"
 
 
+def _fragment_un_text(frag, indent):
+    """
+    Return the text that _write_segments_from_html_els writes for the
+    fragment frag at the given indent, making it only the first time.
+    """
+    key = _UNICODE_NAMES, indent
+    un_text = frag.serializations.get(key)
+    if un_text is None:
+        out_fp = io.StringIO()
+        plain = my_htel.HtEl(*my_htel.htel_parts(frag))
+        _write_segments_from_html_els(out_fp, (plain,), None, indent)
+        un_text = frag.serializations[key] = out_fp.getvalue()
+    return un_text
+
+
 def _key_eq_val_strs(dic):
     return tuple(f"{key}={val}" for key, val in dic.items())
 
@@ -155,23 +229,10 @@ def _stasto(stasto, segtag, kev_strs):
     return " ".join((stasto, segtag, *kev_strs)) + "\n"
 
 
-def _get_pre_lines(sep, segment):
-    pre_lines = []
-    nsruns = segment.split(sep)  # nsrun: non-sep run
-    for nsrun in nsruns[:-1]:
-        if nsrun:
-            pre_lines.append(nsrun)
-        pre_lines.append(sep)
-    if nsruns[-1]:
-        pre_lines.append(nsruns[-1])
-    return pre_lines
-
-
-def do_quick_test_of_get_pre_lines():
-    """Do a quick test."""
-    lines1 = _get_pre_lines(" ", " " + "אבג")
-    lines2 = _get_pre_lines(" ", "דהו" + " ")
-    lines3 = _get_pre_lines(" ", " " + "זחט" + " ")
-    assert lines1 == [" ", "אבג"]
-    assert lines2 == ["דהו", " "]
-    assert lines3 == [" ", "זחט", " "]
+def _pre_lines(segment):
+    """
+    Yield, in one pass, the pre-lines of segment: each separator (space or
+    NBSP) on its own, and each (maximal) run of non-separators.
+    """
+    for match in _PRE_LINE_RE.finditer(segment):
+        yield match.group()
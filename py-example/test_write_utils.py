@@ -0,0 +1,15 @@
+"""
+Tests of write_utils. Run with pytest from this directory (py-example).
+"""
+
+from mb_cmn import str_defs as sd
+from py_misc import write_utils
+
+
+def test_pre_lines_splits_off_separators():
+    """_pre_lines yields each separator (space or NBSP) as its own line."""
+    assert list(write_utils._pre_lines(" " + "אבג")) == [" ", "אבג"]
+    assert list(write_utils._pre_lines("דהו" + " ")) == ["דהו", " "]
+    assert list(write_utils._pre_lines(" " + "זחט" + " ")) == [" ", "זחט", " "]
+    lines4 = list(write_utils._pre_lines("אב" + sd.NBSP + " " + "גד" + sd.NBSP))
+    assert lines4 == ["אב", sd.NBSP, " ", "גד", sd.NBSP]